@@ -0,0 +1,116 @@
+"""Per-user mastery aggregates and the local policy that picks the next difficulty and topic.
+
+user["mastery"][topic][difficulty] holds attempts, passes, hints, avg_score, recent (a moving
+pass rate that follows the latest attempts) and last_seen. process_submission updates it in O(1).
+Everything here reads only those aggregates: no history scan and no LLM call.
+"""
+import time
+
+from question_store import normalize_topic
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+RECENT_WEIGHT = 0.3   # Weight of the newest attempt in the moving pass rate
+MIN_ATTEMPTS = 3      # Attempts at a level before it can count as mastered
+MASTERED_RATE = 0.8   # Moving pass rate needed to move up a level...
+MAX_HINTS = 1.0       # ...using at most this many hints per attempt
+STRUGGLING_RATE = 0.4 # Below this, the next question is one level easier
+
+
+def _empty_cell():
+    return {"attempts": 0, "passes": 0, "hints": 0, "avg_score": 0.0, "recent": 0.0, "last_seen": None}
+
+
+def record_attempt(user, topic, difficulty, passed, hints, score, now=None):
+    """Fold one submission into the user's aggregates for (topic, difficulty)."""
+    topics = user.setdefault("mastery", {})
+    cell = topics.setdefault(normalize_topic(topic), {}).setdefault(difficulty, _empty_cell())
+    cell["attempts"] += 1
+    cell["passes"] += int(bool(passed))
+    cell["hints"] += hints
+    cell["avg_score"] += (score - cell["avg_score"]) / cell["attempts"]
+    # The first attempt sets the rate outright; later ones move it by RECENT_WEIGHT
+    weight = 1.0 if cell["attempts"] == 1 else RECENT_WEIGHT
+    cell["recent"] += weight * (float(bool(passed)) - cell["recent"])
+    cell["last_seen"] = now if now is not None else time.time()
+    return cell
+
+
+def _cell(user, topic, difficulty):
+    return (user.get("mastery") or {}).get(normalize_topic(topic), {}).get(difficulty) or _empty_cell()
+
+
+def _mastered(cell):
+    return (cell["attempts"] >= MIN_ATTEMPTS and cell["recent"] >= MASTERED_RATE
+            and cell["hints"] / cell["attempts"] <= MAX_HINTS)
+
+
+def next_difficulty(user, topic):
+    """(difficulty, reason): the first level of the topic not mastered yet, one lower while struggling."""
+    for level, difficulty in enumerate(DIFFICULTIES):
+        cell = _cell(user, topic, difficulty)
+        if _mastered(cell) and level < len(DIFFICULTIES) - 1:
+            continue
+        if cell["attempts"] >= 2 and cell["recent"] < STRUGGLING_RATE and level > 0:
+            return DIFFICULTIES[level - 1], f"Reviewing {DIFFICULTIES[level - 1]} before retrying {difficulty}."
+        if not cell["attempts"]:
+            if level == 0:
+                return difficulty, "Starting at easy for a new topic."
+            return difficulty, f"{DIFFICULTIES[level - 1].capitalize()} is mastered; moving up to {difficulty}."
+        if _mastered(cell):
+            return difficulty, f"{difficulty.capitalize()} is mastered; keep it sharp."
+        return difficulty, f"Working on {difficulty}: {cell['passes']}/{cell['attempts']} passed so far."
+    return DIFFICULTIES[-1], ""
+
+
+def _topic_strength(user, topic):
+    # Moving pass rate of the weakest level tried, then how long ago the topic was practiced
+    cells = [c for c in (user.get("mastery") or {}).get(normalize_topic(topic), {}).values() if c["attempts"]]
+    return min((c["recent"] for c in cells), default=0.0), max((c["last_seen"] or 0 for c in cells), default=0)
+
+
+def next_topic(user, topics):
+    """(topic, reason): a topic never practiced first, otherwise the weakest, least recently practiced one."""
+    candidates = [t for t in topics if normalize_topic(t) != "general"] or list(topics)
+    practiced = (user.get("mastery") or {}).keys()
+    for topic in candidates:
+        if normalize_topic(topic) not in practiced:
+            return topic, "You have not practiced this topic yet."
+    weakest = min(candidates, key=lambda t: _topic_strength(user, t))
+    return weakest, "Your weakest topic right now."
+
+
+def recommend(user, topics):
+    """(topic, difficulty, reason) for the next question."""
+    topic, topic_reason = next_topic(user, topics)
+    difficulty, difficulty_reason = next_difficulty(user, topic)
+    return topic, difficulty, f"{topic_reason} {difficulty_reason}".strip()
+
+
+def performance_summary(user, topic):
+    """One line about the user's record on the topic, for the question prompt."""
+    cells = (user.get("mastery") or {}).get(normalize_topic(topic), {})
+    parts = [
+        f"{d}: {c['passes']}/{c['attempts']} passed, {c['hints'] / c['attempts']:.1f} hints per attempt"
+        for d in DIFFICULTIES if (c := cells.get(d)) and c["attempts"]
+    ]
+    return "; ".join(parts) if parts else "No attempts on this topic yet."
+
+
+def topic_stats(user):
+    """One row per practiced topic, built from the aggregates only."""
+    rows = []
+    for topic, cells in sorted((user.get("mastery") or {}).items()):
+        attempts = sum(c["attempts"] for c in cells.values())
+        if not attempts:
+            continue
+        passes = sum(c["passes"] for c in cells.values())
+        rows.append({
+            "Topic": topic.title(),
+            "Attempts": attempts,
+            "Pass rate": f"{passes / attempts:.0%}",
+            "Avg score": round(sum(c["avg_score"] * c["attempts"] for c in cells.values()) / attempts, 1),
+            "Hints / attempt": round(sum(c["hints"] for c in cells.values()) / attempts, 1),
+            "Next level": next_difficulty(user, topic)[0],
+            "Last practiced": time.strftime("%Y-%m-%d", time.localtime(max(c["last_seen"] or 0 for c in cells.values()))),
+        })
+    return rows
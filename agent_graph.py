@@ -1,28 +1,43 @@
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
+from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import Runnable, RunnableLambda
-from question_bank import QUESTION_BANK
-from langgraph.graph import StateGraph
+from question_store import get_question_store
+from history_store import load_question_texts, question_key
+from dedup_index import NearDuplicateIndex, get_user_index
+from llm_backends import llm_for
+import metrics
+from helper_functions import generate_text, agenerate_text
+from test_runner import canonicalize_expected
 from typing import TypedDict
-import streamlit as st
+from pydantic import BaseModel, Field, field_validator
 
-import random
-
-# Load OpenAI key
+import asyncio
 import os
-#pulling key from secrets
-openai_api_key = st.secrets["OPENAI_API_KEY"]
-
+import sqlite3
+from functools import lru_cache
 
-# Define the LLM
-llm = ChatOpenAI(model="gpt-4o", temperature=0.3)
+# The LLM comes from the backend registry (llm_backends) and is resolved at call time,
+# so a different model (e.g. the offline FakeChatModel) can be injected with set_llm().
+# llm_for(site) also labels the call's timing, tokens and cache hits with that call site.
 
 class GraphState(TypedDict, total=False):
+    action: str                # What this run should do; see ACTION_NODES
     difficulty: str
+    topic: str
     current_question: dict
+    prefetched: dict           # A question generated in the background, served instead of a new one
     user_answer: str
+    answer_correct: bool
+    profile: dict              # Measured complexity of the answer (complexity_profiler), if profiled
+    test_run: str              # Id of the latest test run; submitting it counts as one attempt however often
     feedback: str
     hint: str
+    hint_count: int
+    solution: str
+    username: str
+    generation_mode: str
+    performance: str           # The student's record on the topic (adaptive.performance_summary)
+    exclude_questions: list    # Question texts not to serve, e.g. ones already queued by the prefetcher
+    pending: dict              # {"question", "values"} from one session, applied only while that question is current
 
 # Define the prompt template for generating questions
 QUESTION_PROMPT_TEMPLATE = """
@@ -34,7 +49,7 @@ Here are some example questions and test cases. These are not to be used for gen
 Generate a new question at the difficulty level specified below:
 - Relevant to the topic: {topic}
 - Difficulty: {difficulty}
-
+{performance}{avoid_questions}
 Use the following format:
 Format:
 Question: <the question here>
@@ -52,10 +67,107 @@ Evaluate the student's answer and provide feedback.
 Provide next question based on the student's quality and performance. Better quality and performance means harder questions.
 """
 
+# Structured mode: same instructions, but the answer is a JSON object validated against GeneratedQuestion
+STRUCTURED_QUESTION_PROMPT_TEMPLATE = """
+You are a helpful Data Science Python tutor helping candidates prepare for a coding interview. You can generate a Python question for selected topic based on the difficulty level.
+
+Here are some example questions and test cases. These are not to be used for generating new questions, but to provide context for the type of questions you can generate:
+{few_shot_examples}
+
+Generate a new question at the difficulty level specified below:
+- Relevant to the topic: {topic}
+- Difficulty: {difficulty}
+{performance}{avoid_questions}
+Provide 2 to 3 test cases. Make sure to ALWAYS include at least one test case!
+Each test case input must be a Python call of the function the student writes, e.g. reverse_string('hello'),
+and each expected output must be a Python literal, e.g. 'olleh'.
+Returned lists are graded in any order. Set compare.ordered to true on test cases whose list must come back
+in exactly the given order, e.g. sorted, ranked or top-k results.
+
+Write 3 to 4 hints for the question, starting with a basic hint and making each one more specific. Never reveal the full solution.
+
+Also assign a point value based on the question's depth, complexity, and required reasoning:
+- Easy: 5 to 10 points
+- Medium: 12 to 18 points
+- Hard: 20 to 25 points
+"""
+
+POINT_RANGES = {"easy": (5, 10), "medium": (12, 18), "hard": (20, 25)}
+
+# "bank_first" serves unseen vetted questions from the question store and generates only when it runs out;
+# "structured" and "text" always generate
+DEFAULT_GENERATION_MODE = os.environ.get("TUTOR_GENERATION_MODE", "bank_first")
+
+
+class TestCaseCompare(BaseModel):
+    # Per-test-case overrides of output_compare.DEFAULT_POLICY
+    ordered: bool = Field(
+        default=False,
+        description="True when the order of a returned list matters, e.g. sorted, ranked or top-k results",
+    )
+
+
+class GeneratedTestCase(BaseModel):
+    input: str = Field(description="Python call of the student's function, e.g. reverse_string('hello')")
+    expected_output: str = Field(description="Python literal of the expected return value, e.g. 'olleh'")
+    compare: TestCaseCompare = Field(default_factory=TestCaseCompare)
+
+
+MAX_TEST_CASES = 5
+NUM_HINTS = 4
+
+
+# Counts and point values are not bounds of the schema: a response with one hint too many or
+# 30 points would otherwise be rejected whole and cost a retry. Extra items are dropped here and
+# points are clamped to the difficulty's range by the caller.
+class GeneratedQuestion(BaseModel):
+    question: str = Field(min_length=10, description="The question text")
+    test_cases: list[GeneratedTestCase] = Field(min_length=1, description="2 to 3 test cases")
+    points_possible: int = Field(description="Point value for the question")
+    hints: list[str] = Field(
+        default_factory=list,
+        description="3 to 4 hints, from a basic nudge to a specific pointer, never the full solution",
+    )
+
+    @field_validator("test_cases")
+    @classmethod
+    def _keep_first_test_cases(cls, test_cases):
+        return test_cases[:MAX_TEST_CASES]
+
+    @field_validator("hints")
+    @classmethod
+    def _keep_first_hints(cls, hints):
+        return hints[:NUM_HINTS]
+
+
+class HintLadder(BaseModel):
+    hints: list[str] = Field(min_length=1, description="3 to 4 hints, each more specific than the previous one")
+
+    @field_validator("hints")
+    @classmethod
+    def _keep_first_hints(cls, hints):
+        return hints[:NUM_HINTS]
+
+
+HINT_LADDER_PROMPT_TEMPLATE = """
+You are a helpful Python tutor.
+Given the question:
+
+{question}
+
+Write {num_hints} hints that guide the student step by step. Start with a basic hint and make each
+following hint more specific than the previous one. Never reveal the full solution.
+"""
+
+
 # 🔹 Helper function to build few-shot examples
-def build_few_shot_examples(question_bank, num_examples=3):
-    # Build few-shot examples from the question bank
-    examples = random.sample(question_bank, min(num_examples, len(question_bank)))
+def build_few_shot_examples(store, topic=None, difficulty=None, num_examples=3):
+    # Few-shot examples from the question store: same topic and difficulty first, then the same topic, then any
+    examples = []
+    for filters in ((topic, difficulty), (topic, None), (None, None)):
+        for example in store.sample(*filters, n=num_examples):
+            if len(examples) < num_examples and all(example["id"] != e["id"] for e in examples):
+                examples.append(example)
     examples_text = ""
     for i, example in enumerate(examples, 1):
         question = example["question"]
@@ -76,71 +188,164 @@ def build_few_shot_examples(question_bank, num_examples=3):
 
 def question_generator_node(state: GraphState) -> GraphState:
     difficulty = state.get("difficulty", "easy")
-    user = state.get("user", {})
-    answered_questions = user.get("answered_questions", [])
-
+    username = state.get("username")
+    store = get_question_store()
+    mode = state.get("generation_mode", DEFAULT_GENERATION_MODE)
+    # Near-duplicate index over this user's answered questions (built once per process)
+    answered_index = get_user_index(username, load_question_texts) if username else None
+    # Not answered but not to be served again either: the question on screen and the queued ones
+    pending_index = NearDuplicateIndex()
+    for text in [(state.get("current_question") or {}).get("question"), *(state.get("exclude_questions") or [])]:
+        if text:
+            pending_index.add(text)
+
+    def similar_to_seen(text):
+        return (answered_index.similar(text) if answered_index is not None else []) or pending_index.similar(text)
+
+    # 📚 Bank first: an unseen vetted question is served without any LLM call
+    if mode == "bank_first":
+        banked = store.next_unseen(
+            state.get("topic"), difficulty, is_seen=lambda text: bool(similar_to_seen(text)),
+        )
+        if banked is not None:
+            metrics.increment("tutor_questions_served_total", source="bank")
+            state["hint_count"] = 0
+            state["current_question"] = current_question_record(
+                banked["question"], state.get("topic", "General"), banked["test_cases"], difficulty,
+                banked.get("points_possible") or sum(POINT_RANGES.get(difficulty, (5, 25))) // 2,
+                banked.get("hints", []),
+            )
+            # Verified by generate_bank.py; "Show Solution" serves it without an LLM call
+            state["current_question"]["reference_solution"] = banked.get("solution")
+            if banked.get("target_complexity"):
+                state["current_question"]["target_complexity"] = banked["target_complexity"]
+            return state
+        mode = "structured"  # Bank exhausted for this user: generate
 
     # Generate few-shot examples
-    few_shot_examples = build_few_shot_examples(QUESTION_BANK, num_examples=3)
-    
+    few_shot_examples = build_few_shot_examples(store, state.get("topic"), difficulty, num_examples=3)
+
+    template = STRUCTURED_QUESTION_PROMPT_TEMPLATE if mode == "structured" else QUESTION_PROMPT_TEMPLATE
+    avoid = []
 
     max_attempts = 5
     for _ in range(max_attempts):
         # 📜 Format prompt
-        prompt = PromptTemplate.from_template(QUESTION_PROMPT_TEMPLATE).format(
+        prompt = PromptTemplate.from_template(template).format(
             few_shot_examples=few_shot_examples,
             difficulty=difficulty,
-            topic=state.get("topic", "general")
+            topic=state.get("topic", "general"),
+            performance=format_performance(state.get("performance")),
+            avoid_questions=format_avoid_questions(avoid)
         )
 
-        # 💬 Call LLM
-        response_text = llm.invoke(prompt)
-        response_text = response_text.content.strip() if hasattr(response_text, "content") else response_text.strip()
-
-        # 🧩 Parse
-        question_text = ""
-        test_cases = []
-        current_input = ""
-        current_output = ""
-
-        for line in response_text.split("\n"):
-            if line.lower().startswith("question:"):
-                question_text = line.split(":", 1)[1].strip()
-            elif line.lower().startswith("input:"):
-                current_input = line.split(":", 1)[1].strip()
-            elif line.lower().startswith("expected output:"):
-                current_output = line.split(":", 1)[1].strip()
-                test_cases.append({
-                    "input": current_input,
-                    "expected_output": current_output
-                })
-
-        # ⛔️ Skip if already answered
-        if question_text and question_text not in answered_questions:
+        # 💬 Call LLM (structured mode also returns the point value, so no second call)
+        if mode == "structured":
+            question_text, test_cases, points, hints = generate_structured_question(prompt, difficulty)
+        else:
+            question_text, test_cases = generate_text_question(prompt)
+            points, hints = None, []
+
+        if not question_text or not test_cases:
+            metrics.increment("tutor_question_generation_attempts_total", outcome="invalid")
+            continue
+
+        # ⛔️ Skip if already answered or queued, including rephrasings of those questions
+        similar = similar_to_seen(question_text)
+        if not similar:
+            metrics.increment("tutor_question_generation_attempts_total", outcome="accepted")
             break
+        metrics.increment("tutor_question_generation_attempts_total", outcome="duplicate")
+        # Tell the next attempt what to steer away from
+        avoid.append(similar[0][1])
 
-    # TODO: Upgrade to semantic deduplication using embeddings if repeated patterns emerge.
-    
     else:
         # 😬 Fallback after too many retries
+        metrics.increment("tutor_question_generation_exhausted_total")
         question_text = "You've answered all available questions! Come back later for more."
         test_cases = []
+        points, hints = None, []
 
     # 🎯 Assign points
-    points = assign_point_value(question_text, difficulty)
+    if points is None:
+        points = assign_point_value(question_text, difficulty)
 
+    if test_cases:
+        metrics.increment("tutor_questions_served_total", source="llm")
     # reset hint count
     state["hint_count"] = 0
     # Update the state
-    state["current_question"] = {
+    state["current_question"] = current_question_record(
+        question_text, state.get("topic", "General"), test_cases, difficulty, points, hints
+    )
+
+    return state
+
+
+def current_question_record(question_text, topic, test_cases, difficulty, points, hints):
+    return {
         "question": question_text,
-        "topic": state.get("topic", "General"),
+        "topic": topic,
         "test_cases": test_cases,
+        # Parsed once here instead of re-eval'ing the strings on every test run
+        "expected_values": canonicalize_expected(test_cases),
         "difficulty": difficulty,
-        "points_possible": points
+        "points_possible": points,
+        # Hint ladder served by hint_generator_node; generated on the first hint if empty
+        "hints": hints
     }
 
-    return state
+def format_performance(performance):
+    if not performance:
+        return ""
+    return f"The student's record on this topic so far: {performance}\nPitch the question to that record.\n"
+
+def format_avoid_questions(avoid):
+    if not avoid:
+        return ""
+    listed = "\n".join(f"- {q}" for q in avoid)
+    return f"The student has already solved these questions. Do NOT generate anything similar to them:\n{listed}\n"
+
+
+def generate_text_question(prompt):
+    response_text = llm_for("question_generator").invoke(prompt)
+    response_text = response_text.content.strip() if hasattr(response_text, "content") else response_text.strip()
+
+    # 🧩 Parse
+    question_text = ""
+    test_cases = []
+    current_input = ""
+    current_output = ""
+
+    for line in response_text.split("\n"):
+        if line.lower().startswith("question:"):
+            question_text = line.split(":", 1)[1].strip()
+        elif line.lower().startswith("input:"):
+            current_input = line.split(":", 1)[1].strip()
+        elif line.lower().startswith("expected output:"):
+            current_output = line.split(":", 1)[1].strip()
+            test_cases.append({
+                "input": current_input,
+                "expected_output": current_output
+            })
+    return question_text, test_cases
+
+
+def generate_structured_question(prompt, difficulty):
+    # One schema-validated round trip for question, test cases and points
+    try:
+        generated = llm_for("question_generator").with_structured_output(GeneratedQuestion).invoke(prompt)
+    except Exception:
+        return "", [], None, []  # Invalid/unparseable output counts as a failed attempt
+
+    low, high = POINT_RANGES.get(difficulty, (5, 25))
+    return (
+        generated.question.strip(),
+        [tc.model_dump() for tc in generated.test_cases],
+        min(max(generated.points_possible, low), high),
+        [hint.strip() for hint in generated.hints if hint.strip()],
+    )
+
 
 def assign_point_value(question_text, difficulty):
     prompt = f"""
@@ -158,7 +363,7 @@ def assign_point_value(question_text, difficulty):
     Difficulty: {difficulty}
     Question: {question_text}
     """
-    response = llm.invoke(prompt)
+    response = llm_for("assign_point_value", cached=True).invoke(prompt)
     try:
         return int(response.content.strip())
     except:
@@ -166,56 +371,280 @@ def assign_point_value(question_text, difficulty):
 
 
 
-def hint_generator_node(state: GraphState) -> GraphState:
+def build_hint_prompt(state):
     question_text = state.get("current_question", {}).get("question", "")
-    prompt = f"""
+    return f"""
     You are a helpful Python tutor.
     Given the question:\n\n{question_text}
     Provide a hint to help the student.
     """
-    response = llm.invoke(prompt)
-    state["hint"] = response.content
+
+
+def generate_hint_ladder(question_text):
+    # One call for every hint of the question; cached so other users get it for free
+    prompt = HINT_LADDER_PROMPT_TEMPLATE.format(question=question_text, num_hints=NUM_HINTS)
+    try:
+        ladder = llm_for("hint_ladder", cached=True).invoke_structured(HintLadder, prompt)
+    except Exception:
+        return []
+    return [hint.strip() for hint in ladder.hints if hint.strip()]
+
+
+def next_ladder_hint(state):
+    """Return the hint for the current hint_count from the question's ladder (generating it once), or None."""
+    question = state.get("current_question", {})
+    if not question.get("hints") and question.get("question"):
+        question["hints"] = generate_hint_ladder(question["question"])
+    hints = question.get("hints") or []
+    if not hints:
+        return None
+    # Escalate with every click, then keep repeating the most specific hint
+    return hints[min(state.get("hint_count", 0), len(hints) - 1)]
+
+
+def hint_generator_node(state: GraphState, render=None) -> GraphState:
+    hint = next_ladder_hint(state)
+    if hint is None:
+        # No ladder available: fall back to a single generated hint
+        hint = generate_text(llm_for("hint_generator", cached=True), build_hint_prompt(state), render=render)
+    elif render is not None:
+        render([hint])
+    state["hint"] = hint
     # Track number of hints used
     state["hint_count"] = state.get("hint_count", 0) + 1
     return state
 
 
+async def ahint_generator_node(state: GraphState, render=None) -> GraphState:
+    hint = await asyncio.to_thread(next_ladder_hint, state)
+    if hint is None:
+        hint = await agenerate_text(llm_for("hint_generator", cached=True), build_hint_prompt(state), render=render)
+    elif render is not None:
+        render.update(hint, done=True)
+    state["hint"] = hint
+    state["hint_count"] = state.get("hint_count", 0) + 1
+    return state
+
 
-def answer_checker_node(state: GraphState) -> GraphState:
+def build_answer_checker_prompt(state):
     user_answer = state.get("user_answer", "")
     question_text = state.get("current_question", {}).get("question", "")
-    prompt = f"""
+    return f"""
     You are a helpful Python tutor.
     Given the question:\n\n{question_text}
     and the student's code:\n\n{user_answer}
     Give clear and concise feedback in less than 15 words — mention if the logic is correct, if any edge cases are missed, or if the code can be improved.
     """
-    response = llm.invoke(prompt)
-    state["feedback"] = response.content
+
+
+def answer_checker_node(state: GraphState, render=None) -> GraphState:
+    state["feedback"] = generate_text(llm_for("answer_checker"), build_answer_checker_prompt(state), render=render)
+    return state
+
+
+async def aanswer_checker_node(state: GraphState, render=None) -> GraphState:
+    state["feedback"] = await agenerate_text(llm_for("answer_checker"), build_answer_checker_prompt(state), render=render)
     return state
 
 def compute_score(base_points: int, hint_count: int) -> int:
     deduction = min(hint_count * 2, base_points - 1)  # 2 points per hint
     return base_points - deduction
 
-    
-graph = StateGraph(GraphState)
 
 
-graph.add_node("question_generator", question_generator_node)
-graph.add_node("answer_checker", answer_checker_node)
-graph.add_node("hint_generator", hint_generator_node)
+def build_solution_prompt(state):
+    question_text = state.get("current_question", {}).get("question", "")
+    return f"""
+    You are a helpful Python tutor. Here is the question:\n\n{question_text}\n\n
+    Provide the final solution as code.
+    """
+
+
+def solution_generator_node(state: GraphState, render=None) -> GraphState:
+    # Kept in the checkpoint, so showing it again does not call the LLM
+    reference = state.get("current_question", {}).get("reference_solution")
+    if reference and not state.get("solution"):
+        state["solution"] = f"```python\n{reference.strip()}\n```"
+    if state.get("solution"):
+        if render is not None:
+            render([state["solution"]])
+        return state
+    state["solution"] = generate_text(llm_for("solution", cached=True), build_solution_prompt(state), render=render)
+    return state
+
+
+# ============================
+# 🔀 Graph: one run per user action, checkpointed per user
+# ============================
+
+# Graph state is saved after every step (thread_id = username), so it survives reruns and reconnects
+CHECKPOINT_PATH = os.environ.get("TUTOR_CHECKPOINT_PATH", ".graph_checkpoints.sqlite")
+
+ACTION_NODES = {
+    "generate": "question_generator",
+    "hint": "hint_generator",
+    "check": "answer_checker",
+    "solution": "solution_generator",
+}
+
+# Cleared whenever a new question is served
+FRESH_QUESTION_STATE = {"prefetched": None, "user_answer": None, "answer_correct": None, "profile": None,
+                        "test_run": None, "feedback": None, "hint": None, "solution": None}
+
+
+def route_action(state: GraphState) -> str:
+    # Any other action (e.g. "update") only stores the values it was invoked with
+    return ACTION_NODES.get(state.get("action"), "__end__")
+
+
+def _apply_pending(state: GraphState) -> GraphState:
+    # All of a user's sessions (tabs) share one checkpoint. Values sent for a question that another
+    # session has since replaced are dropped, and so is the action, so a test run never passes the
+    # newer question.
+    pending = state.get("pending")
+    if not pending:
+        return {}
+    current = (state.get("current_question") or {}).get("question") or ""
+    if question_key(pending["question"]) != question_key(current):
+        return {"pending": None, "action": None}
+    return {**pending["values"], "pending": None}
+
+
+def _render(config):
+    # Streaming callbacks travel in the run config; they are not part of the checkpointed state
+    return (config or {}).get("configurable", {}).get("render")
+
+
+def _generate_step(state: GraphState) -> GraphState:
+    prefetched = state.get("prefetched")
+    if prefetched:
+        state["current_question"] = prefetched
+        state["hint_count"] = 0
+    else:
+        state = question_generator_node(state)
+    return {**state, **FRESH_QUESTION_STATE}
+
+
+def _hint_step(state, config):
+    return hint_generator_node(state, render=_render(config))
+
+
+async def _ahint_step(state, config):
+    return await ahint_generator_node(state, render=_render(config))
+
+
+def _check_step(state, config):
+    return answer_checker_node(state, render=_render(config))
+
+
+async def _acheck_step(state, config):
+    return await aanswer_checker_node(state, render=_render(config))
 
-# Connect the nodes
-graph.set_entry_point("question_generator")
-graph.add_edge("question_generator", "answer_checker")
-graph.add_edge("answer_checker", "hint_generator")
 
-# Define entry point
-graph.set_entry_point("question_generator")
+def _solution_step(state, config):
+    return solution_generator_node(state, render=_render(config))
 
-# Compile the graph
-graph = graph.compile()
 
-# Save the graph to a file
-# graph.save("agent_graph.json")
+@lru_cache(maxsize=None)
+def _graph_builder():
+    # langgraph is slow to import and not needed at startup
+    from langgraph.graph import StateGraph, START, END
+
+    graph = StateGraph(GraphState)
+
+    graph.add_node("question_generator", _generate_step)
+    graph.add_node("hint_generator", RunnableLambda(_hint_step, afunc=_ahint_step))
+    graph.add_node("answer_checker", RunnableLambda(_check_step, afunc=_acheck_step))
+    graph.add_node("solution_generator", _solution_step)
+    graph.add_node("apply_pending", _apply_pending)
+
+    # Route on the user's action; every node is a single step
+    graph.add_edge(START, "apply_pending")
+    graph.add_conditional_edges("apply_pending", route_action, [*ACTION_NODES.values(), END])
+    for node in ACTION_NODES.values():
+        graph.add_edge(node, END)
+    return graph
+
+
+@lru_cache(maxsize=None)
+def get_graph():
+    """The graph compiled with the SQLite checkpointer (once per process)."""
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    conn = sqlite3.connect(CHECKPOINT_PATH, check_same_thread=False)
+    return _graph_builder().compile(checkpointer=SqliteSaver(conn))
+
+
+# Only a thread's latest checkpoint is ever read (the next run, load_graph_state), so older ones are
+# deleted after every run; otherwise each action would add a checkpoint that is kept forever
+PRUNE_CHECKPOINTS_SQL = (
+    "DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id < "
+    "(SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ?)"
+)
+
+
+def _prune_checkpoints(saver, username):
+    with saver.cursor() as cur:
+        for table in ("writes", "checkpoints"):  # writes first: the subquery reads checkpoints
+            cur.execute(PRUNE_CHECKPOINTS_SQL.format(table=table), (username, username))
+
+
+async def _aprune_checkpoints(saver, username):
+    async with saver.lock, saver.conn.cursor() as cur:
+        for table in ("writes", "checkpoints"):
+            await cur.execute(PRUNE_CHECKPOINTS_SQL.format(table=table), (username, username))
+        await saver.conn.commit()
+
+
+def _run_config(username, render=None):
+    return {"configurable": {"thread_id": username, "render": render}}
+
+
+def _restore(values):
+    # The checkpoint serializer turns tuples into lists, so expected values are re-parsed from the strings
+    question = values.get("current_question")
+    if question and question.get("test_cases"):
+        question["expected_values"] = canonicalize_expected(question["test_cases"])
+    return values
+
+
+def load_graph_state(username) -> GraphState:
+    """The user's last checkpointed state ({} for a new user)."""
+    return _restore(dict(get_graph().get_state(_run_config(username)).values))
+
+
+def _graph_input(action, username, question, updates):
+    if question is None:
+        return {**updates, "action": action, "username": username}
+    return {"action": action, "username": username, "pending": {"question": question, "values": updates}}
+
+
+def run_graph(action, username, render=None, question=None, **updates) -> GraphState:
+    """Store `updates` in the user's state, run the step for `action` and return the new state.
+
+    With `question` (the text the caller is showing), the updates and the action are dropped when the
+    user's current question is a different one, e.g. after a new question was generated in another tab.
+    """
+    graph = get_graph()
+    state = graph.invoke(_graph_input(action, username, question, updates), _run_config(username, render))
+    _prune_checkpoints(graph.checkpointer, username)
+    return _restore(state)
+
+
+async def arun_graph(action, username, render=None, question=None, **updates) -> GraphState:
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    # The async saver is bound to the running event loop, so it is opened per run
+    async with AsyncSqliteSaver.from_conn_string(CHECKPOINT_PATH) as saver:
+        graph = _graph_builder().compile(checkpointer=saver)
+        state = await graph.ainvoke(_graph_input(action, username, question, updates), _run_config(username, render))
+        await _aprune_checkpoints(saver, username)
+    return _restore(state)
+
+
+async def acheck_answer(state: GraphState, render=None) -> GraphState:
+    """Run the answer check through the graph, updating `state` in place (see helper_functions.asubmit)."""
+    question = (state.get("current_question") or {}).get("question", "")
+    state.update(await arun_graph("check", state["username"], render=render, question=question,
+                                  user_answer=state.get("user_answer")))
+    return state
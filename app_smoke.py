@@ -0,0 +1,69 @@
+"""Click through the logged-in app once and fail on any error, to catch breakage that only shows
+inside Streamlit (which runs main.py as __main__).
+
+main.py is rendered with Streamlit's AppTest against the offline fake LLM and an in-memory
+Firestore. A fresh user generates a question, executes code and runs the test cases in the sandbox.
+
+    python app_smoke.py
+"""
+import os
+import sys
+
+os.environ.setdefault("TUTOR_LLM_BACKEND", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY", "0")
+os.environ.setdefault("QUESTION_STORE_PATH", ":memory:")
+os.environ.setdefault("TUTOR_CHECKPOINT_PATH", ":memory:")
+
+
+def _button(app, label):
+    return next(b for b in app.button if b.label == label)
+
+
+def _problems(app):
+    # Script exceptions, plus sandbox failures the app only reports as error boxes
+    problems = [e.value for e in app.exception]
+    problems += [e.value for e in app.error if "limit exceeded" in e.value or "timed out" in e.value]
+    return problems
+
+
+def run_smoke():
+    """Messages of everything that went wrong; empty when the app works."""
+    from streamlit.testing.v1 import AppTest
+
+    import auth
+    import firebase_config
+    from fake_firestore import FakeFirestore
+
+    firebase_config.set_db(FakeFirestore())
+    user = auth.sign_up("smoke", "Smoke Test", "secret")
+
+    app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"),
+                            default_timeout=120)
+    app.session_state["logged_in"] = True
+    app.session_state["user"] = user
+    app.run()
+    steps = [
+        ("🎯 Generate New Question", lambda: bool(app.session_state["graph_state"].get("current_question"))),
+        ("▶️ Execute Code (no test cases)", lambda: any("executed successfully" in i.value for i in app.info)),
+        ("🧪 Run Test Cases", lambda: app.session_state["graph_state"].get("answer_correct") is not None),
+    ]
+    problems = _problems(app)
+    for label, succeeded in steps:
+        if problems:
+            break
+        _button(app, label).click().run()
+        problems = _problems(app) or ([] if succeeded() else [f"{label}: no result shown"])
+    return problems
+
+
+def main():
+    problems = run_smoke()
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ generate, execute and test run all worked")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
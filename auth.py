@@ -1,36 +1,109 @@
+import copy
 import json
 import os
+import threading
+import time
 import streamlit as st
 import hashlib
 from helper_functions import load_user_into_session
-import firebase_admin
-from firebase_admin import credentials, firestore
-from firebase_config import init_firebase
+from firebase_config import get_db
+import metrics
+
+# Profiles read in this process are reused by later sessions and reconnects for this long
+USER_CACHE_TTL = float(os.environ.get("TUTOR_USER_CACHE_TTL", 300))
+
+_user_cache = {}  # username -> (expires_at, user dict)
+_user_cache_lock = threading.Lock()
+
+
+def _cache_user(user):
+    with _user_cache_lock:
+        _user_cache[user["username"]] = (time.monotonic() + USER_CACHE_TTL, copy.deepcopy(user))
+
+
+def invalidate_user(username):
+    """Drop the cached profile; called on every write to the user document."""
+    with _user_cache_lock:
+        _user_cache.pop(username, None)
 
-db = init_firebase()
 
 def get_user(username):
-    doc = db.collection("users").document(username).get()
-    return doc.to_dict() if doc.exists else None
+    # Read-through: sessions mutate their user dict, so the cache only hands out copies
+    with _user_cache_lock:
+        cached = _user_cache.get(username)
+        if cached is not None and cached[0] > time.monotonic():
+            metrics.increment("tutor_user_cache_total", result="hit")
+            return copy.deepcopy(cached[1])
+    metrics.increment("tutor_user_cache_total", result="miss")
+    with metrics.timed("tutor_firestore_seconds", op="get_user"):
+        doc = get_db().collection("users").document(username).get()
+    if not doc.exists:
+        return None
+    user = doc.to_dict()
+    _cache_user(user)
+    return user
+
+def update_user_fields(username, fields):
+    # Field-level write; untouched fields (and their history) are not re-sent
+    try:
+        with metrics.timed("tutor_firestore_seconds", op="update_user_fields"):
+            get_db().collection("users").document(username).update(fields)
+    finally:
+        invalidate_user(username)
 
-def update_user(user):
-    db.collection("users").document(user["username"]).set(user)
+def _credentials(username):
+    # Login reads only this small document, never the profile
+    return get_db().collection("credentials").document(username)
 
 def sign_up(username, name, password):
-    if get_user(username):
-        raise ValueError("Username already exists.")
+    from google.api_core.exceptions import AlreadyExists
+
     user = {
         "username": username,
         "name": name,
-        "password": hash_password(password),
         "total_score": 0,
         "streak": 0,
-        "answered_questions": [],
+        "answered_count": 0,
         "hints_used": 0
     }
-    update_user(user)
+    # 🔐 One atomic commit: both create() calls fail if the username is taken, even under concurrent signups
+    batch = get_db().batch()
+    batch.create(_credentials(username), {"username": username, "password": hash_password(password)})
+    batch.create(get_db().collection("users").document(username), user)
+    try:
+        with metrics.timed("tutor_firestore_seconds", op="sign_up"):
+            batch.commit()
+    except AlreadyExists:
+        raise ValueError("Username already exists.")
+    _cache_user(user)
     return user
 
+def _stored_password(username):
+    with metrics.timed("tutor_firestore_seconds", op="get_credentials"):
+        doc = _credentials(username).get()
+    if doc.exists:
+        return doc.get("password")
+
+    # Accounts from before the credentials collection: project just the hash out of the user document
+    with metrics.timed("tutor_firestore_seconds", op="get_user_password"):
+        doc = get_db().collection("users").document(username).get(field_paths=["password"])
+    password = doc.get("password") if doc.exists else None
+    if password:
+        from google.api_core.exceptions import AlreadyExists
+
+        try:
+            _credentials(username).create({"username": username, "password": password})
+        except AlreadyExists:
+            pass
+    return password
+
+def authenticate(username, password):
+    """The user's profile if the password matches, else None."""
+    stored = _stored_password(username)
+    if not stored or stored != hash_password(password):
+        return None
+    return get_user(username)
+
 def hash_password(password):
     import hashlib
     return hashlib.sha256(password.encode()).hexdigest()
@@ -60,8 +133,8 @@ def login_or_signup():
 
     else:  # Login mode
         if st.button("Login"):
-            user = get_user(username)
-            if user and user["password"] == hash_password(password):
+            user = authenticate(username, password)
+            if user:
                 st.session_state.logged_in = True
                 st.session_state.user = user
                 load_user_into_session(user)  # ✅ This ensures total_score, streak, etc. load into session
@@ -0,0 +1,302 @@
+"""End-to-end load and latency benchmark for tutor sessions.
+
+Simulated users run the real flow (question generation, sandboxed test run, hint, answer check,
+submission, plain rerun) concurrently against the offline FakeChatModel and an in-memory
+Firestore. Like the app, every question action goes through the compiled graph, so each one also
+writes and prunes its SQLite checkpoint. Submissions are graded on the fast path, so the summary
+update they trigger shows up as background work. For every action it reports p50/p95/p99 latency, LLM calls and prompt tokens, and
+Firestore reads/writes, plus the process's peak RSS.
+
+    python benchmark.py --users 8 --rounds 3 --repeat 5 --save-baseline benchmark_baseline.json
+    python benchmark.py --users 8 --rounds 3 --compare benchmark_baseline.json
+"""
+import os
+import tempfile
+
+# Must be set before the app modules are imported
+os.environ.setdefault("TUTOR_LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_CACHE_PATH", ":memory:")
+os.environ.setdefault("QUESTION_STORE_PATH", ":memory:")
+# A real file: the async answer check opens its own connection, which would not see a :memory: database
+os.environ.setdefault("TUTOR_CHECKPOINT_PATH",
+                      os.path.join(tempfile.mkdtemp(prefix="tutor-benchmark-"), "checkpoints.sqlite"))
+
+import argparse
+import asyncio
+import contextvars
+import json
+import resource
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+ACTIONS = ["signup", "login", "generate", "run_tests", "hint", "check_answer", "submit", "rerun"]
+TOPICS = ["General", "Strings", "Lists & Dictionaries", "Loops", "Pandas", "Numpy", "Data Structures", "Recursion"]
+
+
+class Recorder:
+    """Collects latency samples and counters, attributed to the action running in the current context."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.counters = defaultdict(Counter)
+        # A context variable rather than a thread-local: async LLM calls run in executor threads
+        # that copy the caller's context, so they still count towards the action awaiting them
+        self._name = contextvars.ContextVar("benchmark_action", default=None)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def action(self, name):
+        token = self._name.set(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._name.reset(token)
+            with self._lock:
+                self.samples[name].append(elapsed)
+
+    def count(self, kind, n=1):
+        name = self._name.get() or "background"
+        with self._lock:
+            self.counters[name][kind] += n
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def run_session(index, rounds, recorder, pool):
+    import auth
+    from agent_graph import acheck_answer, run_graph
+    from grading import fast_submit
+    from history_store import load_history_page, migrate_inline_history
+    from learning_summary import get_learning_summary
+    from fake_llm import FAKE_QUESTIONS
+    from llm_backends import get_llm
+    from user_store import UserStore
+
+    solutions = {q["question"]: q["solution"] for q in FAKE_QUESTIONS}
+    username = f"bench-user-{index}"
+
+    with recorder.action("signup"):
+        auth.sign_up(username, f"Bench User {index}", "secret")
+    with recorder.action("login"):
+        user = auth.authenticate(username, "secret")
+        migrate_inline_history(user)
+    store = UserStore(user)
+
+    for round_number in range(rounds):
+        with recorder.action("generate"):
+            state = run_graph(
+                "generate", username,
+                topic=TOPICS[(index + round_number) % len(TOPICS)],
+                difficulty=["easy", "medium", "hard"][round_number % 3],
+            )
+        question = state["current_question"]
+        if not question["test_cases"]:
+            break  # Every canned question has been answered already
+
+        code = solutions.get(question["question"], "")
+        with recorder.action("run_tests"):
+            run = pool.run_tests(code, question["test_cases"], expected_values=question["expected_values"])
+            # Checkpointed after every test run, as in the app
+            state = run_graph(
+                "update", username, question=question["question"],
+                answer_correct=run["ok"] and all(r["passed"] for r in run["results"]), user_answer=code,
+                test_run=uuid.uuid4().hex,
+            )
+
+        with recorder.action("hint"):
+            state = run_graph("hint", username)
+        with recorder.action("check_answer"):
+            state = asyncio.run(acheck_answer(state))
+        with recorder.action("submit"):
+            result = fast_submit(state, user, summary_llm=get_llm())
+            store.flush()
+        if result["future"] is not None:
+            # The summary fold runs after the score, like in the app; its LLM call counts as background work
+            summary = result["future"].result()["learning_summary"]
+            if summary:
+                user["learning_summary"] = summary
+        with recorder.action("rerun"):
+            # What every plain Streamlit rerun does with the user: render the summary, flush changes
+            get_learning_summary(user, get_llm(), lambda n: load_history_page(username, page_size=n)[0])
+            store.flush()
+
+
+def run_benchmark(users, rounds, latency):
+    import firebase_config
+    import llm_backends
+    from fake_firestore import FakeFirestore
+    from fake_llm import FakeChatModel
+    from sandbox import SandboxPool
+
+    # Deferred imports would otherwise land in the first timed actions; cold start is startup_profile.py's job
+    import firebase_admin.firestore  # noqa: F401
+    import numpy  # noqa: F401
+    from agent_graph import get_graph
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver  # noqa: F401
+    get_graph()
+
+    recorder = Recorder()
+
+    class CountingFakeChatModel(FakeChatModel):
+        def _record(self, text):
+            recorder.count("llm_calls")
+            recorder.count("prompt_tokens", max(1, len(text) // 4))
+            super()._record(text)
+
+    llm_backends.set_llm(CountingFakeChatModel(latency=latency))
+    firebase_config.set_db(FakeFirestore(on_operation=lambda kind, n: recorder.count(f"firestore_{kind}s", n)))
+    pool = SandboxPool()
+    pool.wait_ready()
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=users) as executor:
+            for future in [executor.submit(run_session, i, rounds, recorder, pool) for i in range(users)]:
+                future.result()
+    finally:
+        pool.shutdown()
+    wall_clock = time.perf_counter() - started
+
+    actions = {}
+    for name in ACTIONS:
+        samples = recorder.samples.get(name, [])
+        if not samples:
+            continue
+        counters = recorder.counters[name]
+        actions[name] = {
+            "count": len(samples),
+            "p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "p95_ms": round(percentile(samples, 95) * 1000, 2),
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            "llm_calls_per_action": round(counters["llm_calls"] / len(samples), 3),
+            "prompt_tokens_per_action": round(counters["prompt_tokens"] / len(samples), 1),
+            "firestore_reads_per_action": round(counters["firestore_reads"] / len(samples), 3),
+            "firestore_writes_per_action": round(counters["firestore_writes"] / len(samples), 3),
+        }
+    return {
+        "config": {"users": users, "rounds": rounds, "llm_latency_s": latency},
+        "wall_clock_s": round(wall_clock, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "actions": actions,
+    }
+
+
+def worst_of(reports):
+    """Merge repeated runs, keeping each metric's worst value, for a baseline that run-to-run noise won't trip."""
+    merged = dict(reports[0], actions={})
+    merged["wall_clock_s"] = max(r["wall_clock_s"] for r in reports)
+    merged["peak_rss_mb"] = max(r["peak_rss_mb"] for r in reports)
+    for name in reports[0]["actions"]:
+        runs = [r["actions"][name] for r in reports if name in r["actions"]]
+        merged["actions"][name] = {metric: max(run[metric] for run in runs) for metric in runs[0]}
+    return merged
+
+
+def run_repeated(users, rounds, latency, repeat):
+    # Each run in its own process: answered-question indexes and caches are per process, and a
+    # second run in this one would start with them warm
+    reports = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="tutor-benchmark-") as tmp:
+            path = os.path.join(tmp, "report.json")
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--users", str(users), "--rounds", str(rounds),
+                 "--llm-latency", str(latency), "--save-baseline", path],
+                env={**os.environ, "TUTOR_CHECKPOINT_PATH": os.path.join(tmp, "checkpoints.sqlite")},
+                stdout=subprocess.DEVNULL, check=True,
+            )
+            with open(path) as f:
+                reports.append(json.load(f))
+    return worst_of(reports)
+
+
+def print_report(report):
+    header = f"{'action':<14}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'llm':>7}{'tokens':>9}{'fs rd':>8}{'fs wr':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in report["actions"].items():
+        print(
+            f"{name:<14}{stats['count']:>5}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+            f"{stats['llm_calls_per_action']:>7}{stats['prompt_tokens_per_action']:>9}"
+            f"{stats['firestore_reads_per_action']:>8}{stats['firestore_writes_per_action']:>8}"
+        )
+    print(f"\nwall clock: {report['wall_clock_s']} s | peak RSS: {report['peak_rss_mb']} MB")
+
+
+# Metrics compared against the baseline; latency gets a relative tolerance plus an absolute floor
+COMPARED_METRICS = {
+    "p95_ms": 2.0,
+    "llm_calls_per_action": 0.0,
+    "prompt_tokens_per_action": 0.0,
+    "firestore_reads_per_action": 0.0,
+    "firestore_writes_per_action": 0.0,
+}
+
+
+def compare(report, baseline, tolerance):
+    """Return a list of human-readable regressions of report against baseline."""
+    regressions = []
+    for name, stats in report["actions"].items():
+        base = baseline["actions"].get(name)
+        if base is None:
+            continue
+        for metric, floor in COMPARED_METRICS.items():
+            old, new = base.get(metric, 0), stats.get(metric, 0)
+            if new > old * (1 + tolerance) and new - old > floor:
+                regressions.append(f"{name}.{metric}: {old} -> {new}")
+    if report["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak_rss_mb: {baseline['peak_rss_mb']} -> {report['peak_rss_mb']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=8, help="concurrent simulated users")
+    parser.add_argument("--rounds", type=int, default=3, help="questions answered per user")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM call")
+    parser.add_argument("--repeat", type=int, default=1, help="run N times and keep each metric's worst value")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (default 25%%)")
+    args = parser.parse_args(argv)
+
+    if args.repeat > 1:
+        report = run_repeated(args.users, args.rounds, args.llm_latency, args.repeat)
+    else:
+        report = run_benchmark(args.users, args.rounds, args.llm_latency)
+    print_report(report)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""Empirical time complexity of a submission, measured on generated inputs of growing size.
+
+A test case's call (e.g. max_subarray([1, -3, 2, 1, -1])) is the template. Its list, string, dict,
+array and DataFrame arguments are regenerated with n = 10^2 ... 10^6 elements of the same kind.
+The function is timed on each size (best of a few repeats), its peak memory is traced with
+tracemalloc, and the growth of the timings is matched against the usual complexity classes.
+
+Runs inside sandbox workers (SandboxPool.profile), so it stays free of streamlit/firebase imports.
+"""
+import ast
+import math
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+from contextlib import redirect_stdout
+
+# Small sizes first so that quadratic solutions still get enough points within the budget
+SIZES = [100, 200, 500, 1_000, 2_000, 5_000, 10_000, 20_000, 50_000, 100_000, 200_000, 500_000, 1_000_000]
+# Seconds of measuring per profile; keep it under the sandbox CPU limit (SANDBOX_CPU_SECONDS)
+TIME_BUDGET = float(os.environ.get("PROFILE_TIME_BUDGET", 3))
+MIN_POINTS = 3
+MAX_REPEATS = 5
+REPEAT_SECONDS = 0.2   # A size stops repeating once its runs took this long in total
+TIME_FLOOR = 1e-5      # Seconds; faster runs are timer noise
+MEMORY_FLOOR = 4096    # Bytes; smaller peaks are interpreter bookkeeping, not the data
+FIT_SLACK = 0.05       # Relative error by which a simpler class may fit worse and still be chosen
+WORD_POOL = 10_000     # Distinct random strings generated for lists of strings
+
+COMPLEXITY_CLASSES = [
+    ("O(1)", lambda n: 1.0),
+    ("O(log n)", math.log),
+    ("O(n)", lambda n: n),
+    ("O(n log n)", lambda n: n * math.log(n)),
+    ("O(n^2)", lambda n: n ** 2),
+    ("O(n^3)", lambda n: n ** 3),
+]
+CLASS_RANK = {name: rank for rank, (name, _) in enumerate(COMPLEXITY_CLASSES)}
+
+# 🏎️ Extra points for hard questions solved within the target complexity (0 turns it off)
+EFFICIENCY_BONUS = int(os.environ.get("TUTOR_EFFICIENCY_BONUS", 0))
+DEFAULT_TARGET_COMPLEXITY = "O(n log n)"
+
+
+def parse_call(call_source):
+    """(function name, [argument sources], {keyword: source}) for a call like f([1, 2], k=3), else None."""
+    try:
+        node = ast.parse(str(call_source).strip(), mode="eval").body
+    except SyntaxError:
+        return None
+    if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Name):
+        return None
+    if any(isinstance(a, ast.Starred) for a in node.args) or any(k.arg is None for k in node.keywords):
+        return None
+    return node.func.id, [ast.unparse(a) for a in node.args], {k.arg: ast.unparse(k.value) for k in node.keywords}
+
+
+def _size(value):
+    np, pd = sys.modules.get("numpy"), sys.modules.get("pandas")
+    if isinstance(value, (list, tuple, set, dict, str)):
+        return len(value)
+    if (np is not None and isinstance(value, np.ndarray) and value.ndim > 0) or \
+            (pd is not None and isinstance(value, (pd.DataFrame, pd.Series))):
+        return len(value)
+    return None
+
+
+def _elements(values, n, rng):
+    # n new elements drawn like the sample: numbers from a range widened to n, strings from its alphabet
+    if not values:
+        return None
+    if all(isinstance(v, bool) for v in values):
+        return rng.choices([False, True], k=n)
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        low, high = min(values), max(values)
+        low = min(low, -n) if low < 0 else low
+        return rng.choices(range(low, max(high, low + n) + 1), k=n)
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        low, high = min(values), max(values)
+        low = min(low, -n) if low < 0 else low
+        high = max(high, low + n)
+        return [low + (high - low) * rng.random() for _ in range(n)]
+    if all(isinstance(v, str) for v in values):
+        alphabet = sorted(set("".join(values))) or ["a"]
+        lengths = [len(v) for v in values]
+        pool = ["".join(rng.choices(alphabet, k=rng.choice(lengths))) for _ in range(min(n, WORD_POOL))]
+        return rng.choices(pool, k=n)
+    return rng.choices(values, k=n)
+
+
+def scale_value(value, n, rng):
+    """A value shaped like `value` but with n elements; None when it cannot be scaled."""
+    np, pd = sys.modules.get("numpy"), sys.modules.get("pandas")
+    if not _size(value):
+        return None
+    if isinstance(value, str):
+        return "".join(rng.choices(sorted(set(value)), k=n))
+    if isinstance(value, dict):
+        keys = list(value)
+        if all(isinstance(k, int) for k in keys):
+            new_keys = range(n)
+        elif all(isinstance(k, str) for k in keys):
+            new_keys = [f"{keys[0]}{i}" for i in range(n)]
+        else:
+            return None
+        return dict(zip(new_keys, _elements(list(value.values()), n, rng)))
+    if isinstance(value, (list, tuple, set)):
+        elements = _elements(list(value), n, rng)
+        return type(value)(elements)
+    if pd is not None and isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.sample(n, replace=True, random_state=rng.randrange(2 ** 32)).reset_index(drop=True)
+    if value.ndim == 1 and value.dtype.kind in "iufb":
+        return np.asarray(_elements(value.tolist(), n, rng), dtype=value.dtype)
+    return value[np.random.default_rng(rng.randrange(2 ** 32)).integers(0, len(value), n)]
+
+
+def _scaled(value, n, rng):
+    scaled = scale_value(value, n, rng)
+    return value if scaled is None else scaled
+
+
+def _fresh(value):
+    # Shallow copy, so a function that sorts or pops its input in place sees the same input every run
+    if isinstance(value, (list, dict, set)):
+        return type(value)(value)
+    return value.copy() if hasattr(value, "copy") and not isinstance(value, (str, tuple)) else value
+
+
+def _template(test_cases, namespace, preloaded_globals):
+    # The call whose collection arguments are largest, so the generated data looks most like real input
+    best = None
+    for test_case in test_cases:
+        parsed = parse_call(test_case.get("input", ""))
+        if parsed is None or not callable(namespace.get(parsed[0])):
+            continue
+        name, arg_sources, kwarg_sources = parsed
+        try:
+            args = [eval(source, dict(preloaded_globals)) for source in arg_sources]
+            kwargs = {key: eval(source, dict(preloaded_globals)) for key, source in kwarg_sources.items()}
+        except Exception:
+            continue
+        total = sum(_size(v) or 0 for v in args + list(kwargs.values()))
+        if total and (best is None or total > best[0]):
+            best = (total, namespace[name], args, kwargs)
+    return best[1:] if best else None
+
+
+def _best_time(func, args, kwargs):
+    best, spent, repeats = math.inf, 0.0, 0
+    while repeats < MAX_REPEATS and (repeats == 0 or spent < REPEAT_SECONDS):
+        fresh_args, fresh_kwargs = [_fresh(a) for a in args], {k: _fresh(v) for k, v in kwargs.items()}
+        started = timeit.default_timer()
+        func(*fresh_args, **fresh_kwargs)
+        elapsed = timeit.default_timer() - started
+        best, spent, repeats = min(best, elapsed), spent + elapsed, repeats + 1
+    return best
+
+
+def _peak_memory(func, args, kwargs):
+    # A separate run: tracing slows the code down too much to time it at the same time
+    fresh_args, fresh_kwargs = [_fresh(a) for a in args], {k: _fresh(v) for k, v in kwargs.items()}
+    tracemalloc.start()
+    try:
+        func(*fresh_args, **fresh_kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _slope(ns, values):
+    xs, ys = [math.log(n) for n in ns], [math.log(max(v, 1e-9)) for v in values]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread if spread else 0.0
+
+
+def _fit(ns, values, growth):
+    # t = a + b * growth(n) with a, b >= 0: the constant term absorbs call overhead. Least squares on
+    # relative errors, so small and large sizes count alike; returns the RMS relative error
+    gs, ts = [growth(n) for n in ns], list(values)
+    ws = [1 / t ** 2 for t in ts]
+    sw, sg, sgg = sum(ws), sum(w * g for w, g in zip(ws, gs)), sum(w * g * g for w, g in zip(ws, gs))
+    st, sgt = sum(w * t for w, t in zip(ws, ts)), sum(w * g * t for w, g, t in zip(ws, gs, ts))
+    det = sw * sgg - sg * sg
+    a, b = st / sw, 0.0
+    if det > 1e-12 * sw * sgg:
+        b = (sw * sgt - sg * st) / det
+        a = (st - b * sg) / sw
+        if a < 0:
+            a, b = 0.0, sgt / sgg
+        elif b < 0:
+            a, b = st / sw, 0.0
+    return math.sqrt(sum(((a + b * g - t) / t) ** 2 for g, t in zip(gs, ts)) / len(ts))
+
+
+def fit_complexity(ns, values, floor=TIME_FLOOR):
+    """The simplest class whose fitted curve is within FIT_SLACK of the best fit to the values.
+
+    Values below `floor` are timer or allocator noise and left out; if too few remain, the growth is
+    too small to measure and counts as O(1).
+    """
+    measured = [(n, v) for n, v in zip(ns, values) if v >= floor]
+    if len(measured) < MIN_POINTS:
+        return COMPLEXITY_CLASSES[0][0]
+    ns, values = [n for n, _ in measured], [v for _, v in measured]
+    errors = [(name, _fit(ns, values, growth)) for name, growth in COMPLEXITY_CLASSES]
+    best = min(error for _, error in errors)
+    return next(name for name, error in errors if error <= best + FIT_SLACK)
+
+
+def _projected_cost(points, last, n):
+    # Extrapolates the next size from the growth so far: generating the input scales linearly, the
+    # timed and traced runs with the measured exponent, and extra repeats stop at REPEAT_SECONDS
+    ratio = n / last["n"]
+    growth = max(_slope([p["n"] for p in points], [p["seconds"] for p in points]), 1) if len(points) > 1 else 1
+    run = points[-1]["seconds"] * ratio ** growth
+    return (last["generate"] * ratio + run + last["trace"] * ratio ** growth
+            + min(REPEAT_SECONDS, (MAX_REPEATS - 1) * run))
+
+
+def profile_function(source, test_cases, preloaded_globals, budget=TIME_BUDGET, sizes=SIZES):
+    """Time the submitted function on scaled inputs.
+
+    Returns {"complexity", "exponent", "memory_complexity", "points", "reason"}; complexity is None
+    (and reason says why) when fewer than MIN_POINTS sizes could be measured within the budget.
+    """
+    from test_runner import load_module
+
+    result = {"complexity": None, "exponent": None, "memory_complexity": None, "points": [], "reason": None}
+    namespace = load_module(source, preloaded_globals)
+    template = _template(test_cases, namespace, preloaded_globals)
+    if template is None:
+        result["reason"] = "No test case passes a list, string, dict, array or DataFrame to the function."
+        return result
+
+    func, args, kwargs = template
+    rng = random.Random(0)
+    deadline = timeit.default_timer() + budget
+    points, last = result["points"], None
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for n in sizes:
+            if last is not None and timeit.default_timer() + _projected_cost(points, last, n) > deadline:
+                break
+            started = timeit.default_timer()
+            scaled_args = [_scaled(a, n, rng) for a in args]
+            scaled_kwargs = {k: _scaled(v, n, rng) for k, v in kwargs.items()}
+            generated = timeit.default_timer()
+            try:
+                seconds = _best_time(func, scaled_args, scaled_kwargs)
+                traced = timeit.default_timer()
+                peak = _peak_memory(func, scaled_args, scaled_kwargs)
+            except MemoryError:
+                result["reason"] = f"Ran out of memory at n = {n:,}."
+                break
+            except Exception as e:
+                result["reason"] = f"The function raised {type(e).__name__} on generated input of size {n:,}: {e}"
+                break
+            points.append({"n": n, "seconds": seconds, "peak_bytes": peak})
+            last = {"n": n, "generate": generated - started, "trace": timeit.default_timer() - traced}
+
+    if len(points) < MIN_POINTS:
+        result["reason"] = result["reason"] or "Too slow to measure enough input sizes within the time budget."
+        return result
+    ns = [p["n"] for p in points]
+    # Slope over the largest sizes, where fixed overhead matters least
+    seconds = [max(p["seconds"], TIME_FLOOR) for p in points]
+    result["exponent"] = round(_slope(ns[-MIN_POINTS:], seconds[-MIN_POINTS:]), 2)
+    result["complexity"] = fit_complexity(ns, [p["seconds"] for p in points])
+    result["memory_complexity"] = fit_complexity(ns, [p["peak_bytes"] for p in points], floor=MEMORY_FLOOR)
+    return result
+
+
+def efficiency_bonus(profile, question):
+    """Bonus points for a hard question whose measured complexity is within its target; 0 when disabled."""
+    if not EFFICIENCY_BONUS or not profile or profile.get("complexity") not in CLASS_RANK:
+        return 0
+    if str(question.get("difficulty", "")).lower() != "hard":
+        return 0
+    target = question.get("target_complexity", DEFAULT_TARGET_COMPLEXITY)
+    limit = CLASS_RANK.get(target, CLASS_RANK[DEFAULT_TARGET_COMPLEXITY])
+    return EFFICIENCY_BONUS if CLASS_RANK[profile["complexity"]] <= limit else 0
@@ -0,0 +1,128 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+
+from preloaded_packages import LazyModule
+
+np = LazyModule("numpy")  # Loaded with the first signature, not at app startup
+
+# 32 bands x 4 rows: a pair at the 0.6 threshold shares a bucket ~99% of the time
+NUM_PERMUTATIONS = 128
+BAND_ROWS = 4
+DUPLICATE_THRESHOLD = 0.6
+SHINGLE_SIZE = 4  # characters
+MAX_CACHED_USERS = 256
+
+_PRIME = (1 << 31) - 1
+
+
+@lru_cache(maxsize=None)
+def _permutations():
+    rng = np.random.default_rng(20240601)
+    a = rng.integers(1, _PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+    return a, b
+
+
+# Boilerplate words every question shares; dropping them makes rephrasings land close together
+STOP_WORDS = {
+    "a", "an", "and", "all", "as", "be", "by", "for", "from", "function", "given", "in", "is", "it", "its",
+    "of", "on", "python", "return", "returns", "takes", "that", "the", "to", "which", "with", "write",
+}
+
+
+def _shingles(text):
+    words = " ".join(w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in STOP_WORDS)
+    if len(words) <= SHINGLE_SIZE:
+        return {words} if words else set()
+    return {words[i:i + SHINGLE_SIZE] for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little") for s in shingles],
+        dtype=np.uint64,
+    )
+    # (a * h + b) mod p for every permutation/shingle pair, then the minimum per permutation
+    a, b = _permutations()
+    return ((np.outer(a, hashes) + b[:, None]) % np.uint64(_PRIME)).min(axis=1)
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index over question texts; lookups only compare against colliding buckets."""
+
+    def __init__(self):
+        self._signatures = []
+        self._texts = []
+        self._buckets = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._texts)
+
+    def _bands(self, signature):
+        for band in range(NUM_PERMUTATIONS // BAND_ROWS):
+            rows = signature[band * BAND_ROWS:(band + 1) * BAND_ROWS]
+            yield band, rows.tobytes()
+
+    def add(self, text):
+        signature = minhash(text)
+        if signature is None:
+            return
+        with self._lock:
+            doc_id = len(self._texts)
+            self._signatures.append(signature)
+            self._texts.append(text)
+            for band_key in self._bands(signature):
+                self._buckets[band_key].append(doc_id)
+
+    def similar(self, text, threshold=DUPLICATE_THRESHOLD):
+        """Return [(similarity, text)] for indexed questions at or above the threshold, most similar first."""
+        signature = minhash(text)
+        if signature is None:
+            return []
+        with self._lock:
+            candidates = {doc_id for band_key in self._bands(signature) for doc_id in self._buckets.get(band_key, ())}
+            matches = []
+            for doc_id in candidates:
+                similarity = float(np.mean(self._signatures[doc_id] == signature))
+                if similarity >= threshold:
+                    matches.append((similarity, self._texts[doc_id]))
+        return sorted(matches, reverse=True)
+
+
+_user_indexes = OrderedDict()
+_user_indexes_lock = threading.Lock()
+
+
+def get_user_index(username, load_question_texts):
+    """Per-process index of a user's answered questions, built once from load_question_texts(username)."""
+    with _user_indexes_lock:
+        index = _user_indexes.get(username)
+        if index is not None:
+            _user_indexes.move_to_end(username)
+            return index
+
+    index = NearDuplicateIndex()
+    for text in load_question_texts(username):
+        index.add(text)
+
+    with _user_indexes_lock:
+        # Another thread may have built it meanwhile; keep the first one
+        index = _user_indexes.setdefault(username, index)
+        while len(_user_indexes) > MAX_CACHED_USERS:
+            _user_indexes.popitem(last=False)
+    return index
+
+
+def add_to_user_index(username, question_text):
+    # Only updates an index that is already loaded; otherwise it is built from history on first use
+    with _user_indexes_lock:
+        index = _user_indexes.get(username)
+    if index is not None:
+        index.add(question_text)
@@ -0,0 +1,285 @@
+"""In-memory stand-in for the subset of the Firestore client this app uses.
+
+Used by the benchmark harness (and anything else that should run without Firebase) via
+firebase_config.set_db(FakeFirestore()). Every document read and write is counted.
+"""
+import copy
+import datetime as dt
+import threading
+from collections import Counter
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1 import transforms
+
+DESCENDING = "DESCENDING"
+
+
+def _apply_value(target, key, value):
+    if value is transforms.DELETE_FIELD:
+        target.pop(key, None)
+    elif value is transforms.SERVER_TIMESTAMP:
+        target[key] = dt.datetime.now(dt.timezone.utc)
+    elif isinstance(value, transforms.ArrayUnion):
+        current = target.setdefault(key, [])
+        current.extend(v for v in value.values if v not in current)
+    elif isinstance(value, transforms.ArrayRemove):
+        target[key] = [v for v in target.get(key, []) if v not in value.values]
+    elif isinstance(value, transforms.Increment):
+        target[key] = target.get(key, 0) + value.value
+    else:
+        target[key] = copy.deepcopy(value)
+
+
+def _apply_path(data, path, value):
+    # update() takes dotted field paths
+    keys = path.split(".")
+    for key in keys[:-1]:
+        data = data.setdefault(key, {})
+    _apply_value(data, keys[-1], value)
+
+
+def _merge(target, data):
+    # set(..., merge=True): nested maps are merged, everything else replaced
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            _apply_value(target, key, value)
+
+
+def _field(data, path):
+    for key in path.split("."):
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return copy.deepcopy(_field(self._data or {}, field))
+
+
+class FakeDocument:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return FakeCollection(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths=None):
+        data = self._client._read(self.path)
+        if data is not None and field_paths:
+            data = {f: _field(data, f) for f in field_paths if _field(data, f) is not None}
+        return FakeSnapshot(self, data)
+
+    def set(self, data, merge=False):
+        self._client._write(self.path, data, mode="merge" if merge else "set")
+
+    def update(self, fields):
+        self._client._write(self.path, fields, mode="update")
+
+    def create(self, data):
+        self._client._write(self.path, data, mode="create")
+
+    def delete(self):
+        self._client._write(self.path, None, mode="delete")
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=(), orders=(), limit_to=None, start_after_values=None, fields=None):
+        self._collection = collection
+        self._filters = list(filters)
+        self._orders = list(orders)
+        self._limit = limit_to
+        self._start_after = start_after_values
+        self._fields = fields
+
+    def _copy(self, **changes):
+        args = dict(filters=self._filters, orders=self._orders, limit_to=self._limit,
+                    start_after_values=self._start_after, fields=self._fields)
+        args.update(changes)
+        return FakeQuery(self._collection, **args)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + [(field, op, value)])
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(orders=self._orders + [(field, direction)])
+
+    def limit(self, count):
+        return self._copy(limit_to=count)
+
+    def select(self, fields):
+        return self._copy(fields=list(fields))
+
+    def start_after(self, cursor):
+        if isinstance(cursor, FakeSnapshot):
+            cursor = {field: cursor.get(field) for field, _ in self._orders}
+        return self._copy(start_after_values=cursor)
+
+    def _matches(self, data):
+        ops = {
+            "==": lambda a, b: a == b, "!=": lambda a, b: a != b,
+            ">": lambda a, b: a is not None and a > b, ">=": lambda a, b: a is not None and a >= b,
+            "<": lambda a, b: a is not None and a < b, "<=": lambda a, b: a is not None and a <= b,
+            "in": lambda a, b: a in b, "array_contains": lambda a, b: isinstance(a, list) and b in a,
+        }
+        return all(ops[op](_field(data, field), value) for field, op, value in self._filters)
+
+    def _results(self):
+        docs = [(doc_id, data) for doc_id, data in self._collection._documents() if self._matches(data)]
+        for field, direction in reversed(self._orders):
+            docs = [d for d in docs if _field(d[1], field) is not None]
+            docs.sort(key=lambda d: _field(d[1], field), reverse=direction == DESCENDING)
+        if self._start_after is not None:
+            def after(data):
+                key = tuple(_field(data, f) for f, _ in self._orders)
+                bound = tuple(self._start_after.get(f) for f, _ in self._orders)
+                return key < bound if self._orders and self._orders[0][1] == DESCENDING else key > bound
+            docs = [d for d in docs if after(d[1])]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return docs
+
+    def stream(self):
+        results = self._results()
+        self._collection._client._count("read", max(len(results), 1))
+        for doc_id, data in results:
+            if self._fields is not None:
+                data = {f: _field(data, f) for f in self._fields}
+            yield FakeSnapshot(self._collection.document(doc_id), copy.deepcopy(data))
+
+    def get(self):
+        return list(self.stream())
+
+    def count(self):
+        return _FakeAggregation(self)
+
+
+class _FakeAggregation:
+    def __init__(self, query):
+        self._query = query
+
+    def get(self):
+        # Billed like Firestore: one read per batch of up to 1000 index entries
+        results = self._query._results()
+        self._query._collection._client._count("read", max(1, (len(results) + 999) // 1000))
+        return [[type("AggregationResult", (), {"value": len(results), "alias": "count"})()]]
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        super().__init__(self)
+
+    def document(self, doc_id):
+        return FakeDocument(self._client, f"{self.path}/{doc_id}")
+
+    def _documents(self):
+        return self._client._list(self.path)
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append((ref.path, data, "merge" if merge else "set"))
+
+    def update(self, ref, fields):
+        self._ops.append((ref.path, fields, "update"))
+
+    def create(self, ref, data):
+        self._ops.append((ref.path, data, "create"))
+
+    def delete(self, ref):
+        self._ops.append((ref.path, None, "delete"))
+
+    def commit(self):
+        with self._client._lock:
+            # All or nothing, like Firestore: check every precondition before the first write
+            exists = {path: path in self._client._docs for path, _, _ in self._ops}
+            for path, _, mode in self._ops:
+                if mode == "create" and exists[path]:
+                    raise AlreadyExists(f"Document already exists: {path}")
+                if mode == "update" and not exists[path]:
+                    raise NotFound(f"No document to update: {path}")
+                exists[path] = mode != "delete"
+            for path, data, mode in self._ops:
+                self._client._write(path, data, mode)
+        self._ops = []
+
+
+class FakeFirestore:
+    """Thread-safe in-memory Firestore client. `stats` counts document reads and writes."""
+
+    def __init__(self, on_operation=None):
+        self._docs = {}
+        self._lock = threading.RLock()
+        self.stats = Counter()
+        self._on_operation = on_operation  # called with ("read" | "write", count)
+
+    def _count(self, kind, n=1):
+        self.stats[kind] += n
+        if self._on_operation is not None:
+            self._on_operation(kind, n)
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def _read(self, path):
+        self._count("read")
+        with self._lock:
+            return copy.deepcopy(self._docs.get(path))
+
+    def _list(self, collection_path):
+        prefix = collection_path + "/"
+        with self._lock:
+            return [
+                (path[len(prefix):], copy.deepcopy(data))
+                for path, data in self._docs.items()
+                if path.startswith(prefix) and "/" not in path[len(prefix):]
+            ]
+
+    def _write(self, path, data, mode):
+        self._count("write")
+        with self._lock:
+            exists = path in self._docs
+            if mode == "create" and exists:
+                raise AlreadyExists(f"Document already exists: {path}")
+            if mode == "update" and not exists:
+                raise NotFound(f"No document to update: {path}")
+            if mode == "delete":
+                self._docs.pop(path, None)
+                return
+            if mode in ("set", "create"):
+                doc = {}
+                _merge(doc, data)
+            elif mode == "merge":
+                doc = copy.deepcopy(self._docs.get(path, {}))
+                _merge(doc, data)
+            else:
+                doc = copy.deepcopy(self._docs[path])
+                for field_path, value in data.items():
+                    _apply_path(doc, field_path, value)
+            self._docs[path] = doc
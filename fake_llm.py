@@ -0,0 +1,191 @@
+"""Deterministic offline chat model, selected with TUTOR_LLM_BACKEND=fake or injected with set_llm().
+
+Kept out of llm_backends so LangChain's model classes are only imported when the fake backend is used.
+"""
+import itertools
+import json
+import threading
+import time
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+
+# Canned questions in the shape question_generator_node expects; each has runnable test cases
+FAKE_QUESTIONS = [
+    {
+        "question": "Write a function reverse_string(s) that returns the string reversed.",
+        "test_cases": [
+            {"input": "reverse_string('hello')", "expected_output": "'olleh'"},
+            {"input": "reverse_string('')", "expected_output": "''"},
+        ],
+        "solution": "def reverse_string(s):\n    return s[::-1]\n",
+    },
+    {
+        "question": "Write a function sum_even(nums) that adds up the even numbers of a list.",
+        "test_cases": [
+            {"input": "sum_even([1, 2, 3, 4, 5])", "expected_output": "6"},
+            {"input": "sum_even([])", "expected_output": "0"},
+        ],
+        "solution": "def sum_even(nums):\n    return sum(n for n in nums if n % 2 == 0)\n",
+    },
+    {
+        "question": "Write a function count_vowels(text) that counts the vowels in a sentence.",
+        "test_cases": [
+            {"input": "count_vowels('banana')", "expected_output": "3"},
+            {"input": "count_vowels('xyz')", "expected_output": "0"},
+        ],
+        "solution": "def count_vowels(text):\n    return sum(c in 'aeiou' for c in text.lower())\n",
+    },
+    {
+        "question": "Write a function is_palindrome(word) that checks whether a word reads the same backwards.",
+        "test_cases": [
+            {"input": "is_palindrome('racecar')", "expected_output": "True"},
+            {"input": "is_palindrome('python')", "expected_output": "False"},
+        ],
+        "solution": "def is_palindrome(word):\n    return word == word[::-1]\n",
+    },
+    {
+        "question": "Write a function word_frequencies(sentence) that maps every word to how often it occurs.",
+        "test_cases": [
+            {"input": "word_frequencies('a b a')", "expected_output": "{'a': 2, 'b': 1}"},
+        ],
+        "solution": "def word_frequencies(sentence):\n    from collections import Counter\n    return dict(Counter(sentence.split()))\n",
+    },
+    {
+        "question": "Write a function factorial(n) that computes n! recursively.",
+        "test_cases": [
+            {"input": "factorial(5)", "expected_output": "120"},
+            {"input": "factorial(0)", "expected_output": "1"},
+        ],
+        "solution": "def factorial(n):\n    return 1 if n <= 1 else n * factorial(n - 1)\n",
+    },
+    {
+        "question": "Write a function column_means(data) that returns the mean of each column of a dict of lists using pandas.",
+        "test_cases": [
+            {"input": "column_means({'a': [1, 3], 'b': [2, 4]})", "expected_output": "{'a': 2.0, 'b': 3.0}"},
+        ],
+        "solution": "def column_means(data):\n    return pd.DataFrame(data).mean().to_dict()\n",
+    },
+    {
+        "question": "Write a function max_subarray(nums) that returns the largest sum of a contiguous subarray.",
+        "test_cases": [
+            {"input": "max_subarray([-2, 1, -3, 4, -1, 2, 1, -5, 4])", "expected_output": "6"},
+            {"input": "max_subarray([1])", "expected_output": "1"},
+        ],
+        "solution": (
+            "def max_subarray(nums):\n    best = cur = nums[0]\n    for n in nums[1:]:\n"
+            "        cur = max(n, cur + n)\n        best = max(best, cur)\n    return best\n"
+        ),
+    },
+]
+
+FAKE_HINTS = [
+    "Think about which built-in operations work on the input type.",
+    "Break the problem into a loop over the input and a running result.",
+    "Handle the empty input first, then the general case.",
+    "Check your loop bounds and what you return at the end.",
+]
+
+
+def _prompt_text(prompt):
+    if isinstance(prompt, str):
+        return prompt
+    if isinstance(prompt, list):
+        return "\n".join(getattr(m, "content", str(m)) for m in prompt)
+    return getattr(prompt, "to_string", lambda: str(prompt))()
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic offline chat model with configurable latency, for profiling and load tests.
+
+    Responses are chosen from the prompt: question prompts get the next FAKE_QUESTIONS entry in the
+    expected format, point-value prompts a number, anything else a short canned reply. Entries in
+    `script` ({substring: response}) take precedence.
+    """
+
+    latency: float = 0.05
+    script: dict = {}
+    model_name: str = "fake-tutor"
+    temperature: float = 0.0
+    calls: int = 0
+    prompt_tokens: int = 0
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._questions = itertools.cycle(FAKE_QUESTIONS)
+        self._counter_lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-tutor"
+
+    def _record(self, text):
+        # Approximate token count (~4 characters per token)
+        with self._counter_lock:
+            self.calls += 1
+            self.prompt_tokens += max(1, len(text) // 4)
+        time.sleep(self.latency)
+
+    @staticmethod
+    def _usage(prompt, response):
+        prompt_tokens, completion_tokens = max(1, len(prompt) // 4), max(1, len(response) // 4)
+        return {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _next_question(self):
+        with self._counter_lock:
+            return next(self._questions)
+
+    def respond(self, text):
+        for needle, response in self.script.items():
+            if needle in text:
+                return response
+        if "Generate a new question" in text:
+            question = self._next_question()
+            cases = "\n".join(
+                f"Test case:\nInput: {tc['input']}\nExpected Output: {tc['expected_output']}"
+                for tc in question["test_cases"]
+            )
+            return f"Question: {question['question']}\n{cases}"
+        if "assign a point value" in text:
+            return "8"
+        if "final solution" in text:
+            return f"```python\n{self._next_question()['solution']}```"
+        if "Explanation:" in text:
+            return "Explanation: The result differs for this input.\nHint: Trace the code by hand for it."
+        return "Good progress! Keep practicing with slightly harder problems."
+
+    def _structured(self, schema, text):
+        self._record(text)
+        name = getattr(schema, "__name__", "")
+        if name == "HintLadder":
+            payload = {"hints": FAKE_HINTS}
+        elif name in ("GeneratedQuestion", "BankQuestion"):
+            question = self._next_question()
+            payload = {"question": question["question"], "test_cases": question["test_cases"],
+                       "points_possible": 8, "hints": FAKE_HINTS, "solution": question["solution"]}
+        else:
+            payload = json.loads(self.script.get(name, "{}"))
+        return schema.model_validate(payload) if hasattr(schema, "model_validate") else payload
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text = _prompt_text(messages)
+        self._record(text)
+        response = self.respond(text)
+        message = AIMessage(content=response, usage_metadata=self._usage(text, response))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        text = _prompt_text(messages)
+        self._record(text)
+        response = self.respond(text)
+        for word in response.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(text, response)))
+
+    def with_structured_output(self, schema, *, include_raw=False, **kwargs):
+        return RunnableLambda(lambda prompt: self._structured(schema, _prompt_text(prompt)))
@@ -1,9 +1,12 @@
 # firebase_config.py
 import streamlit as st
-import firebase_admin
-from firebase_admin import credentials, firestore
 
+@st.cache_resource(show_spinner=False)
 def init_firebase():
+    # firebase_admin is imported here so the login page renders before it is loaded
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
     if not firebase_admin._apps:
         cred = credentials.Certificate({
             "type": st.secrets["firebase"]["type"],
@@ -19,3 +22,16 @@ def init_firebase():
         })
         firebase_admin.initialize_app(cred)
     return firebase_admin.firestore.client()
+
+_db = None
+
+def get_db():
+    # Firestore client created on first use (once per process); set_db() swaps in another client (e.g. FakeFirestore)
+    global _db
+    if _db is None:
+        _db = init_firebase()
+    return _db
+
+def set_db(client):
+    global _db
+    _db = client
@@ -0,0 +1,168 @@
+"""Offline bulk generation of vetted questions for the question store.
+
+For every topic and difficulty, parallel rate-limited workers ask the LLM for a question together
+with a reference solution. The solution is run against the question's own test cases in the
+sandbox, and only questions whose solution passes are stored (as vetted). Exact and
+near-duplicates of questions already in the store are skipped.
+
+    python generate_bank.py --per-combo 20 --workers 4 --rate 60
+    TUTOR_LLM_BACKEND=fake python generate_bank.py --per-combo 2 --topics Strings   # offline dry run
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.prompts import PromptTemplate
+from pydantic import Field
+
+from agent_graph import (
+    POINT_RANGES, STRUCTURED_QUESTION_PROMPT_TEMPLATE, GeneratedQuestion, build_few_shot_examples,
+    format_avoid_questions,
+)
+from dedup_index import NearDuplicateIndex
+from llm_backends import llm_for
+from question_store import get_question_store, normalize_topic
+from test_runner import canonicalize_expected
+
+TOPICS = ["General", "Strings", "Lists & Dictionaries", "Loops", "Pandas", "Numpy", "Data Structures", "Recursion"]
+DIFFICULTIES = list(POINT_RANGES)
+MAX_RETRIES = 3
+RECENT_AVOID = 10  # Recently accepted questions of a combo, passed back so the next ones differ
+
+SOLUTION_INSTRUCTIONS = """
+Also write a reference solution: complete Python code that defines the function and passes every test case.
+pandas is available as pd and numpy as np.
+"""
+
+
+class BankQuestion(GeneratedQuestion):
+    solution: str = Field(min_length=10, description="Reference solution: Python code defining the function")
+
+
+class RateLimiter:
+    """Spaces out calls so that at most `per_minute` start per minute, across all workers."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(max(0.0, start - now))
+
+
+class BankBuilder:
+    def __init__(self, store, pool, limiter):
+        self.store = store
+        self.pool = pool
+        self.limiter = limiter
+        self.outcomes = Counter()
+        self._lock = threading.Lock()
+        self._indexes = {}  # normalized topic -> NearDuplicateIndex over the stored questions
+        self._recent = defaultdict(lambda: deque(maxlen=RECENT_AVOID))
+
+    def _index(self, topic):
+        # Built on first use from what the store already holds for the topic
+        key = normalize_topic(topic)
+        if key not in self._indexes:
+            index = NearDuplicateIndex()
+            for question in self.store.iter_questions(topic=topic):
+                index.add(question["question"])
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def generate(self, topic, difficulty):
+        with self._lock:
+            avoid = list(self._recent[(topic, difficulty)])
+        prompt = PromptTemplate.from_template(STRUCTURED_QUESTION_PROMPT_TEMPLATE + SOLUTION_INSTRUCTIONS).format(
+            few_shot_examples=build_few_shot_examples(self.store, topic, difficulty, num_examples=3),
+            difficulty=difficulty,
+            topic=topic,
+            performance="",  # Bank questions are not tailored to a student
+            avoid_questions=format_avoid_questions(avoid),
+        )
+        for attempt in range(MAX_RETRIES):
+            self.limiter.wait()
+            try:
+                return llm_for("generate_bank").with_structured_output(BankQuestion).invoke(prompt)
+            except Exception:
+                time.sleep(2 ** attempt)  # Rate limits and malformed output: back off and retry
+        return None
+
+    def verify(self, candidate):
+        test_cases = [tc.model_dump() for tc in candidate.test_cases]
+        run = self.pool.run_tests(candidate.solution, test_cases, expected_values=canonicalize_expected(test_cases))
+        return run["ok"] and bool(run["results"]) and all(r["passed"] for r in run["results"])
+
+    def produce(self, topic, difficulty):
+        """Generate, verify and store one question; returns the outcome."""
+        candidate = self.generate(topic, difficulty)
+        if candidate is None:
+            outcome = "invalid"
+        elif not self.verify(candidate):
+            outcome = "failed_verification"
+        else:
+            low, high = POINT_RANGES[difficulty]
+            with self._lock:
+                index = self._index(topic)
+                if self.store.contains(candidate.question) or index.similar(candidate.question):
+                    outcome = "duplicate"
+                else:
+                    self.store.add({
+                        "question": candidate.question.strip(),
+                        "topic": topic,
+                        "difficulty": difficulty,
+                        "test_cases": [tc.model_dump() for tc in candidate.test_cases],
+                        "points_possible": min(max(candidate.points_possible, low), high),
+                        "hints": [h.strip() for h in candidate.hints if h.strip()],
+                        "solution": candidate.solution,
+                    }, vetted=True, source="generate_bank")
+                    index.add(candidate.question)
+                    self._recent[(topic, difficulty)].append(candidate.question)
+                    outcome = "accepted"
+        with self._lock:
+            self.outcomes[outcome] += 1
+        return outcome
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topics", nargs="+", default=TOPICS, help="topics to generate for")
+    parser.add_argument("--difficulties", nargs="+", default=DIFFICULTIES, choices=DIFFICULTIES)
+    parser.add_argument("--per-combo", type=int, default=10, help="questions to attempt per topic and difficulty")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent generation workers")
+    parser.add_argument("--rate", type=float, default=60, help="max LLM requests per minute (0 = unlimited)")
+    args = parser.parse_args(argv)
+
+    from sandbox import SandboxPool
+
+    store = get_question_store()
+    pool = SandboxPool(size=max(2, args.workers // 2))
+    builder = BankBuilder(store, pool, RateLimiter(args.rate))
+    jobs = [(t, d) for t in args.topics for d in args.difficulties for _ in range(args.per_combo)]
+    print(f"Generating {len(jobs)} questions with {args.workers} workers "
+          f"(vetted in the store before: {store.count(vetted=True)})")
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for done, _ in enumerate(executor.map(lambda job: builder.produce(*job), jobs), 1):
+                if done % 10 == 0 or done == len(jobs):
+                    print(f"  {done}/{len(jobs)} {dict(builder.outcomes)}")
+    finally:
+        pool.shutdown()
+
+    print(f"\nDone in {time.perf_counter() - started:.1f} s: {dict(builder.outcomes)}")
+    print(f"Vetted questions in the store: {store.count(vetted=True)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Fast-path grading: the score comes from the test run, feedback from static checks of the code.
+
+The LLM comment and the learning-summary update run in the background and arrive after the score.
+TUTOR_GRADING_MODE=llm keeps the old behaviour of waiting for the LLM check (helper_functions.asubmit).
+"""
+import ast
+import copy
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from helper_functions import process_submission
+from learning_summary import fold_into_summary
+
+GRADING_MODE = os.environ.get("TUTOR_GRADING_MODE", "fast")
+MAX_FINDINGS = 5
+DEEP_LOOP_NESTING = 3
+
+_LOOPS = (ast.For, ast.AsyncFor, ast.While)
+_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+# Calls that scan or reshuffle a whole list, so calling them once per iteration is quadratic
+_LINEAR_METHODS = {"index", "count", "remove", "insert"}
+
+# Feedback and summary updates are I/O bound LLM calls shared by all sessions of the process
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="feedback")
+
+
+def _loop_depth(node, depth=0):
+    if isinstance(node, _LOOPS):
+        depth += 1
+    elif isinstance(node, _COMPREHENSIONS):
+        depth += len(node.generators)
+    return max([depth] + [_loop_depth(child, depth) for child in ast.iter_child_nodes(node)])
+
+
+def _unused_parameters(function):
+    used = {node.id for node in ast.walk(function) if isinstance(node, ast.Name)}
+    args = function.args
+    params = [a.arg for a in args.posonlyargs + args.args + args.kwonlyargs]
+    params += [a.arg for a in (args.vararg, args.kwarg) if a is not None]
+    return [p for p in params if p not in used and p not in ("self", "cls") and not p.startswith("_")]
+
+
+def _calls_in_loop_bodies(tree):
+    # The loop's own iterable is evaluated once, so only the body counts
+    for loop in ast.walk(tree):
+        if isinstance(loop, _LOOPS):
+            for statement in loop.body:
+                for node in ast.walk(statement):
+                    if isinstance(node, ast.Call):
+                        yield node
+
+
+def static_checks(code):
+    """Remarks on the code from its AST; an empty list means nothing to point out."""
+    try:
+        tree = ast.parse(code or "")
+    except SyntaxError as e:
+        return [f"Line {e.lineno}: the code does not parse ({e.msg})."]
+
+    findings = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            unused = _unused_parameters(node)
+            if unused:
+                findings.append(f"`{node.name}` never uses its parameter(s): {', '.join(unused)}.")
+        elif isinstance(node, ast.ExceptHandler) and node.type is None:
+            findings.append(f"Line {node.lineno}: a bare `except:` hides every error; catch specific exceptions.")
+
+    depth = _loop_depth(tree)
+    if depth >= DEEP_LOOP_NESTING:
+        findings.append(f"Loops are nested {depth} deep (O(n^{depth})); a dict or set lookup can often remove a level.")
+
+    seen_lines = set()
+    for call in _calls_in_loop_bodies(tree):
+        if call.lineno in seen_lines:
+            continue
+        func = call.func
+        if isinstance(func, ast.Attribute) and func.attr in _LINEAR_METHODS:
+            findings.append(f"Line {call.lineno}: `.{func.attr}()` inside a loop walks the whole list every iteration.")
+            seen_lines.add(call.lineno)
+        elif (isinstance(func, ast.Name) and func.id == "sorted") or (isinstance(func, ast.Attribute) and func.attr == "sort"):
+            findings.append(f"Line {call.lineno}: sorting inside a loop; sort once before it.")
+            seen_lines.add(call.lineno)
+    return findings[:MAX_FINDINGS]
+
+
+def format_feedback(answer_correct, findings):
+    if answer_correct and not findings:
+        return "All tests passed and the code looks clean."
+    heading = "All tests passed. A few things to tidy up:" if answer_correct else "Some tests did not pass."
+    return "\n".join([heading] + [f"- {finding}" for finding in findings])
+
+
+def _background_feedback(state, summary_user, new_answer, check_answer, summary_llm):
+    feedback = check_answer(state).get("feedback") if check_answer is not None else None
+    summary = None
+    if new_answer is not None and summary_llm is not None:
+        fold_into_summary(summary_user, [new_answer], summary_llm)
+        summary = summary_user["learning_summary"]
+    return {"feedback": feedback, "learning_summary": summary}
+
+
+def fast_submit(graph_state, user, check_answer=None, summary_llm=None):
+    """Record the submission and grade it without waiting for the LLM.
+
+    check_answer(state) -> state (e.g. answer_checker_node) and the summary fold run on copies in the
+    background; result["future"] resolves to {"feedback", "learning_summary"} for the caller to apply.
+    """
+    findings = static_checks(graph_state.get("user_answer"))
+    result = process_submission(graph_state, user)
+    result["findings"] = findings
+    result["feedback"] = format_feedback(result["answer_correct"], findings)
+    result["future"] = None
+    if check_answer is not None or (summary_llm is not None and result["new_answer"] is not None):
+        result["future"] = _executor.submit(
+            _background_feedback, copy.deepcopy(graph_state), copy.deepcopy(user),
+            result["new_answer"], check_answer, summary_llm,
+        )
+    return result
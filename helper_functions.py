@@ -1,4 +1,12 @@
+import asyncio
 import streamlit as st
+from learning_summary import fold_into_summary, afold_into_summary
+from history_store import add_answered_question, migrate_inline_history
+from output_compare import is_output_equal
+from complexity_profiler import efficiency_bonus
+from leaderboard import record_score
+from adaptive import record_attempt
+from dedup_index import add_to_user_index
 
 def init_static_session_state():
     static_defaults = {
@@ -18,14 +26,72 @@ def load_user_into_session(user):
     st.session_state.answer_streak = user.get("streak", 0)
     st.session_state.hints_used = user.get("hints_used", 0)
     # Backfill defaults if missing (esp. for older users)
-    if "answered_questions" not in user:
-        user["answered_questions"] = []
+    migrate_inline_history(user)
+    if "answered_count" not in user:
+        user["answered_count"] = 0
     if "last_answered_question" not in user:
         user["last_answered_question"] = None
 
 
-def diagnose_failed_test_case(user_code: str, input_data, expected_output, actual_output, llm) -> str:
-    diagnosis_prompt = f"""
+def generate_text(llm, prompt, render=None) -> str:
+    # With a render callable (e.g. st.write_stream) tokens are shown as they arrive; the full text is returned either way
+    if render is None:
+        return llm.invoke(prompt).content.strip()
+    return (render(chunk.content for chunk in llm.stream(prompt)) or "").strip()
+
+async def agenerate_text(llm, prompt, render=None) -> str:
+    # Async twin of generate_text; render.update(text, done) is called as tokens arrive
+    if render is None:
+        return (await llm.ainvoke(prompt)).content.strip()
+    text = ""
+    async for chunk in llm.astream(prompt):
+        text += chunk.content
+        render.update(text, done=False)
+    render.update(text, done=True)
+    return text.strip()
+
+# Upper bound on LLM requests in flight for one interaction
+DEFAULT_LLM_CONCURRENCY = 4
+
+async def gather_bounded(coroutines, limit=DEFAULT_LLM_CONCURRENCY):
+    semaphore = asyncio.Semaphore(limit)
+    async def bounded(coroutine):
+        async with semaphore:
+            return await coroutine
+    return await asyncio.gather(*(bounded(c) for c in coroutines))
+
+def info_stream(prefix=""):
+    # Render callable that streams text into a single st.info box (sync iterable or async update())
+    placeholder = st.empty()
+    def update(text, done=False):
+        placeholder.info(f"{prefix}{text}" if done else f"{prefix}{text}▌")
+    def render(chunks):
+        text = ""
+        for chunk in chunks:
+            text += chunk
+            update(text)
+        update(text, done=True)
+        return text
+    render.update = update
+    return render
+
+def diagnose_failed_test_case(user_code: str, input_data, expected_output, actual_output, llm, render=None) -> str:
+    diagnosis_prompt = build_diagnosis_prompt(user_code, input_data, expected_output, actual_output)
+    return generate_text(llm, diagnosis_prompt, render=render)
+
+async def adiagnose_failed_test_cases(user_code: str, failed_cases, llm, renders=None, limit=DEFAULT_LLM_CONCURRENCY):
+    # Every failing case is diagnosed at once; wall-clock time is the slowest diagnosis, not the sum
+    renders = renders or [None] * len(failed_cases)
+    return await gather_bounded(
+        [
+            agenerate_text(llm, build_diagnosis_prompt(user_code, fc["input"], fc["expected"], fc["actual"]), render=render)
+            for fc, render in zip(failed_cases, renders)
+        ],
+        limit=limit,
+    )
+
+def build_diagnosis_prompt(user_code, input_data, expected_output, actual_output):
+    return f"""
     You are a Python tutor helping a student debug their function.
 
     The student's code is:
@@ -45,9 +111,9 @@ def diagnose_failed_test_case(user_code: str, input_data, expected_output, actua
     Explanation: ...
     Hint: ...
     """
-    return llm.invoke(diagnosis_prompt).content.strip()
 
-def process_submission(graph_state, user):
+def process_submission(graph_state, user, llm=None):
+    # Without an llm the summary is left to the caller (see asubmit); result["new_answer"] says what to fold in
     feedback = graph_state.get("feedback", "")
     answer_correct = graph_state.get("answer_correct", False)
     question_data = graph_state.get("current_question", {})
@@ -56,53 +122,68 @@ def process_submission(graph_state, user):
     hints_used = graph_state.get("hint_count", 0)
 
     score = max(points - (2 * hints_used), 0)
+    profile = graph_state.get("profile")
+    # 🏎️ Hard questions can earn extra points for a solution that scales well (see complexity_profiler)
+    bonus = efficiency_bonus(profile, question_data) if answer_correct else 0
+    score += bonus
+    new_answer = None
+
+    # 📊 O(1) mastery aggregates for (topic, difficulty); they drive the adaptive policy and progress stats.
+    # One attempt per test run: submitting the same run again must not move the user up a level.
+    test_run = graph_state.get("test_run")
+    if test_run is None or test_run != user.get("last_attempt_run"):
+        record_attempt(user, question_data.get("topic", "General"), question_data.get("difficulty", "easy"),
+                       answer_correct, hints_used, score if answer_correct else 0)
+        user["last_attempt_run"] = test_run
 
     # Update user
     if answer_correct:
-        user["total_score"] += score
         user["streak"] += 1
         user["last_answered_question"] = question_text
         user["hints_used"] = hints_used
 
-        if "answered_questions" not in user:
-            user["answered_questions"] = []
-
-        already_answered = any(q["question"] == question_text for q in user["answered_questions"])
-        if not already_answered:
-            question_data["score_earned"] = score
-            user["answered_questions"].append({
-                "question": question_text,
-                "topic": question_data.get("topic", "General"),
-                "difficulty": question_data.get("difficulty", "easy"),
-                "points_possible": question_data.get("points_possible", 0),
-                "test_cases": question_data.get("test_cases", []),
-                "user_code": graph_state.get("user_answer", "")
-            })
+        question_data["score_earned"] = score
+        answered = {
+            "question": question_text,
+            "topic": question_data.get("topic", "General"),
+            "difficulty": question_data.get("difficulty", "easy"),
+            "points_possible": question_data.get("points_possible", 0),
+            "test_cases": question_data.get("test_cases", []),
+            "user_code": graph_state.get("user_answer", ""),
+            "complexity": (profile or {}).get("complexity"),
+        }
+        # Keyed by question hash: the duplicate check is a single create() on that document
+        if add_answered_question(user["username"], answered, seq=user.get("answered_count", 0)):
+            user["answered_count"] = user.get("answered_count", 0) + 1
+            new_answer = answered
+            add_to_user_index(user["username"], question_text)
+            # 🏆 Points count once per question: the total and the all-time, weekly and topic boards
+            # (one atomic write) are only updated on the first solve, so they always agree
+            user["total_score"] += score
+            record_score(user, score, question_data.get("topic", "General"))
+
+            # 🧠 Only a newly answered question changes the learning summary
+            if llm is not None:
+                fold_into_summary(user, [answered], llm)
     else:
         user["streak"] = 0
 
     return {
         "answer_correct": answer_correct,
         "score": score,
-        "feedback": feedback
+        "efficiency_bonus": bonus,
+        "feedback": feedback,
+        "new_answer": new_answer
     }
 
-def is_output_equal(actual, expected):
-    # Handle numeric comparison with tolerance
-    if isinstance(actual, (int, float)) and isinstance(expected, (int, float)):
-        return abs(actual - expected) < 1e-5
-
-    # Handle strings: ignore leading/trailing whitespace
-    if isinstance(actual, str) and isinstance(expected, str):
-        return actual.strip() == expected.strip()
-
-    # Handle unordered list/set comparison
-    if isinstance(actual, (list, set)) and isinstance(expected, (list, set)):
-        return sorted(actual) == sorted(expected)
-
-    # Handle dict comparison
-    if isinstance(actual, dict) and isinstance(expected, dict):
-        return actual == expected  # you can deep sort keys if needed
-
-    # Final fallback: strict equality
-    return actual == expected
\ No newline at end of file
+async def asubmit(graph_state, user, check_answer, llm, render=None):
+    """Record the submission and fold the summary while the answer feedback is generated."""
+    async def record():
+        result = await asyncio.to_thread(process_submission, graph_state, user)
+        if result["new_answer"] is not None:
+            await afold_into_summary(user, [result["new_answer"]], llm)
+        return result
+
+    _, result = await asyncio.gather(check_answer(graph_state, render=render), record())
+    result["feedback"] = graph_state.get("feedback", "")
+    return result
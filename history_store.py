@@ -0,0 +1,75 @@
+import hashlib
+from firebase_config import get_db
+
+
+HISTORY_PAGE_SIZE = 10
+MAX_BATCH_WRITES = 500  # Firestore limit per batch
+
+
+def question_key(question_text):
+    # Whitespace/case-insensitive key so the duplicate check is a single document lookup
+    normalized = " ".join(question_text.split()).lower()
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def _history(username):
+    return get_db().collection("users").document(username).collection("answered_questions")
+
+
+def add_answered_question(username, record, seq):
+    """Store one answered question; returns False if it was already recorded."""
+    from google.api_core.exceptions import AlreadyExists
+
+    try:
+        _history(username).document(question_key(record["question"])).create({**record, "seq": seq})
+        return True
+    except AlreadyExists:
+        return False
+
+
+def load_history_page(username, page_size=HISTORY_PAGE_SIZE, start_after=None):
+    """Return (records, cursor) for the next page, latest first. Pass cursor back to continue."""
+    from firebase_admin import firestore
+
+    query = _history(username).order_by("seq", direction=firestore.Query.DESCENDING)
+    if start_after is not None:
+        query = query.start_after(start_after)
+    snapshots = list(query.limit(page_size).stream())
+    cursor = snapshots[-1] if len(snapshots) == page_size else None
+    return [snap.to_dict() for snap in snapshots], cursor
+
+
+def load_question_texts(username):
+    # Projection query: only the question field is transferred, not code and test cases
+    if not username:
+        return []
+    return [snap.get("question") for snap in _history(username).select(["question"]).stream()]
+
+
+def migrate_inline_history(user):
+    # Older users keep answered_questions inside the user document; move it to the subcollection once
+    inline = user.get("answered_questions")
+    if inline is None:
+        return
+    from firebase_admin import firestore
+
+    username = user["username"]
+    user_ref = get_db().collection("users").document(username)
+
+    writes = [
+        (_history(username).document(question_key(q["question"])), {**q, "seq": seq})
+        for seq, q in enumerate(inline)
+        if q.get("question")
+    ]
+    for start in range(0, len(writes), MAX_BATCH_WRITES):
+        batch = get_db().batch()
+        for ref, data in writes[start:start + MAX_BATCH_WRITES]:
+            batch.set(ref, data)
+        batch.commit()
+
+    from auth import invalidate_user
+
+    user_ref.update({"answered_questions": firestore.DELETE_FIELD, "answered_count": len(inline)})
+    invalidate_user(username)
+    user.pop("answered_questions")
+    user["answered_count"] = len(inline)
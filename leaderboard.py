@@ -0,0 +1,145 @@
+"""Leaderboards kept up to date on every scored submission, so reading one never scans the users.
+
+Each board is a collection leaderboards/{board}/entries with one document per user, holding that
+user's score on the board. A submission adds its points with Increment to the all-time, this-week
+and topic boards in one atomic batch. Reading the top N is an ordered query with limit N, and a
+user's rank is a count aggregation over the entries with a higher score.
+
+    python leaderboard.py --backfill   # one-time: seed the all-time board from users' total_score
+"""
+import argparse
+import datetime as dt
+import os
+import sys
+import threading
+import time
+
+import metrics
+from firebase_config import get_db
+from question_store import normalize_topic
+
+DEFAULT_LIMIT = 10
+# Boards shown in the sidebar are re-read at most this often per process (own writes show at once)
+LEADERBOARD_CACHE_TTL = float(os.environ.get("TUTOR_LEADERBOARD_CACHE_TTL", 30))
+
+ALL_TIME = "all-time"
+
+_cache = {}  # ("top", board, limit) | ("rank", board, username) -> (expires_at, value)
+_cache_lock = threading.Lock()
+
+
+def week_board(now=None):
+    year, week, _ = (now or dt.datetime.now(dt.timezone.utc)).isocalendar()
+    return f"week-{year}-W{week:02d}"
+
+
+def topic_board(topic):
+    return "topic-" + normalize_topic(topic).replace(" ", "-").replace("/", "-")
+
+
+def boards_for(topic, now=None):
+    """Boards a submission on `topic` counts towards."""
+    return [ALL_TIME, week_board(now), topic_board(topic)]
+
+
+def _entries(board):
+    return get_db().collection("leaderboards").document(board).collection("entries")
+
+
+def _cached(key, load):
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] > time.monotonic():
+            return hit[1]
+    value = load()
+    with _cache_lock:
+        _cache[key] = (time.monotonic() + LEADERBOARD_CACHE_TTL, value)
+    return value
+
+
+def _forget(boards, username):
+    # The writing process sees its own submission right away
+    with _cache_lock:
+        for key in list(_cache):
+            if key[1] in boards and (key[0] == "top" or key[2] == username):
+                del _cache[key]
+
+
+def record_score(user, points, topic, now=None):
+    """Add points to the user's entry on every board for the topic, atomically in one commit."""
+    if points <= 0:
+        return
+    from firebase_admin import firestore
+
+    boards = boards_for(topic, now)
+    batch = get_db().batch()
+    for board in boards:
+        batch.set(_entries(board).document(user["username"]), {
+            "username": user["username"],
+            "name": user.get("name", user["username"]),
+            "score": firestore.Increment(points),
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+    with metrics.timed("tutor_firestore_seconds", op="record_score"):
+        batch.commit()
+    _forget(boards, user["username"])
+
+
+def top(board, limit=DEFAULT_LIMIT):
+    """[{"rank", "username", "name", "score"}] for the best `limit` entries; costs `limit` reads."""
+    from firebase_admin import firestore
+
+    def load():
+        query = _entries(board).order_by("score", direction=firestore.Query.DESCENDING).limit(limit)
+        with metrics.timed("tutor_firestore_seconds", op="leaderboard_top"):
+            docs = query.select(["username", "name", "score"]).get()
+        return [{"rank": i, **doc.to_dict()} for i, doc in enumerate(docs, 1)]
+
+    return _cached(("top", board, limit), load)
+
+
+def rank(board, username):
+    """(rank, score) of the user on the board, or None without an entry. Ties share a rank."""
+    def load():
+        with metrics.timed("tutor_firestore_seconds", op="leaderboard_rank"):
+            entry = _entries(board).document(username).get()
+            if not entry.exists:
+                return None
+            score = entry.get("score") or 0
+            # Count aggregation: billed per 1000 index entries, no documents are read
+            ahead = _entries(board).where("score", ">", score).count().get()[0][0].value
+        return ahead + 1, score
+
+    return _cached(("rank", board, username), load)
+
+
+def backfill():
+    """Seed the all-time board from every user's total_score (a full scan; run once)."""
+    batch, pending, total = get_db().batch(), 0, 0
+    for doc in get_db().collection("users").select(["username", "name", "total_score"]).stream():
+        user = doc.to_dict()
+        if not user.get("total_score"):
+            continue
+        batch.set(_entries(ALL_TIME).document(doc.id), {
+            "username": doc.id, "name": user.get("name", doc.id), "score": user["total_score"],
+        }, merge=True)
+        pending, total = pending + 1, total + 1
+        if pending == 500:  # Firestore's batch limit
+            batch.commit()
+            batch, pending = get_db().batch(), 0
+    if pending:
+        batch.commit()
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill", action="store_true", help="seed the all-time board from users' scores")
+    args = parser.parse_args(argv)
+    if args.backfill:
+        print(f"Seeded {backfill()} users into the {ALL_TIME} board")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
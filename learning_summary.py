@@ -0,0 +1,85 @@
+# Only the newest questions are folded into the summary, so the prompt stays bounded
+MAX_QUESTIONS_PER_UPDATE = 10
+
+SUMMARY_UPDATE_TEMPLATE = """
+Summarize what the user has learned based on their Python practice questions. Be brief and encouraging. Never go beyond 30 words.
+Suggest next steps based on their topics and difficulty levels.
+User's Total Score: {total_score} | Current Streak: {streak}
+User's Last Answered Question: {last_answered_question}
+User's Hints Used: {hints_used}
+
+Previous summary (covers {covered} earlier questions):
+{previous_summary}
+
+Newly answered questions:
+{new_questions}
+
+Update the previous summary so it also reflects the newly answered questions.
+"""
+
+
+def _build_update_prompt(user, new_questions):
+    previous = user.get("learning_summary") or {}
+    recent = new_questions[-MAX_QUESTIONS_PER_UPDATE:]
+    return SUMMARY_UPDATE_TEMPLATE.format(
+        total_score=user.get("total_score", 0),
+        streak=user.get("streak", 0),
+        last_answered_question=user.get("last_answered_question") or "Not available",
+        hints_used=user.get("hints_used", 0),
+        covered=previous.get("covered", 0),
+        previous_summary=previous.get("text") or "None yet.",
+        new_questions="\n".join(
+            f"- {q['question']} ({q.get('topic', 'General')}, {q.get('difficulty', 'easy')})"
+            for q in recent
+        ),
+    )
+
+
+def _store_summary(user, text, new_questions, new_count):
+    previous = user.get("learning_summary") or {}
+    user["learning_summary"] = {
+        "text": text,
+        "covered": previous.get("covered", 0) + (new_count or len(new_questions)),
+    }
+    return text
+
+
+def fold_into_summary(user, new_questions, llm, new_count=None):
+    """Fold newly answered questions into the stored summary with a single bounded LLM call.
+
+    new_count is the number of questions being covered when only the newest of them are passed in.
+    """
+    if not new_questions:
+        return user.get("learning_summary", {}).get("text", "")
+    text = llm.invoke(_build_update_prompt(user, new_questions)).content.strip()
+    return _store_summary(user, text, new_questions, new_count)
+
+
+async def afold_into_summary(user, new_questions, llm, new_count=None):
+    if not new_questions:
+        return user.get("learning_summary", {}).get("text", "")
+    text = (await llm.ainvoke(_build_update_prompt(user, new_questions))).content.strip()
+    return _store_summary(user, text, new_questions, new_count)
+
+
+def get_learning_summary(user, llm, load_recent_questions):
+    """Return the cached summary, only calling the LLM when history is not covered yet (e.g. older users).
+
+    load_recent_questions(n) must return the n most recently answered questions, latest first.
+    """
+    answered_count = user.get("answered_count", 0)
+    if not answered_count:
+        return ""
+
+    summary = user.get("learning_summary") or {}
+    covered = summary.get("covered", 0)
+    if summary.get("text") and covered == answered_count:
+        return summary["text"]
+
+    # History changed outside process_submission (or no summary yet): fold the uncovered tail
+    if covered > answered_count:
+        user.pop("learning_summary", None)
+        covered = 0
+    uncovered = answered_count - covered
+    recent = load_recent_questions(min(uncovered, MAX_QUESTIONS_PER_UPDATE))[::-1]
+    return fold_into_summary(user, recent, llm, new_count=uncovered)
@@ -0,0 +1,143 @@
+import os
+import threading
+
+import streamlit as st
+
+import metrics
+from llm_cache import CachedLLM, get_llm_cache
+
+# Which backend get_llm() builds; "fake" runs fully offline
+DEFAULT_BACKEND = os.environ.get("TUTOR_LLM_BACKEND", "openai")
+
+_factories = {}
+_llm = None
+_cached_llm = None
+_lock = threading.Lock()
+
+
+def register_backend(name, factory):
+    """Register a zero-argument factory that returns a LangChain chat model."""
+    _factories[name] = factory
+
+
+def get_backend_name():
+    return DEFAULT_BACKEND
+
+
+def get_llm():
+    # Built on first use and shared by every caller in the process
+    global _llm
+    with _lock:
+        if _llm is None:
+            _llm = _factories[DEFAULT_BACKEND]()
+        return _llm
+
+
+def get_cached_llm():
+    global _cached_llm
+    llm = get_llm()
+    with _lock:
+        if _cached_llm is None or _cached_llm.llm is not llm:
+            _cached_llm = CachedLLM(llm, get_llm_cache())
+        return _cached_llm
+
+
+def set_llm(llm):
+    """Inject a chat model (e.g. FakeChatModel) used by all nodes from now on."""
+    global _llm
+    with _lock:
+        _llm = llm
+
+
+def _record_usage(site, message):
+    # Cache hits are tagged by CachedLLM; token counts come from the provider's usage metadata
+    metadata = getattr(message, "response_metadata", None) or {}
+    metrics.increment("tutor_llm_calls_total", site=site, cache="hit" if metadata.get("cache_hit") else "miss")
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage.get("input_tokens"):
+        metrics.increment("tutor_llm_tokens_total", usage["input_tokens"], site=site, kind="prompt")
+    if usage.get("output_tokens"):
+        metrics.increment("tutor_llm_tokens_total", usage["output_tokens"], site=site, kind="completion")
+
+
+class InstrumentedLLM:
+    """Records duration, token usage and cache hits of every call, labelled with the call site."""
+
+    def __init__(self, llm, site):
+        self.llm = llm
+        self.site = site
+
+    def invoke(self, prompt, **kwargs):
+        with metrics.timed("tutor_llm_call_seconds", site=self.site):
+            response = self.llm.invoke(prompt, **kwargs)
+        _record_usage(self.site, response)
+        return response
+
+    async def ainvoke(self, prompt, **kwargs):
+        with metrics.timed("tutor_llm_call_seconds", site=self.site):
+            response = await self.llm.ainvoke(prompt, **kwargs)
+        _record_usage(self.site, response)
+        return response
+
+    def stream(self, prompt, **kwargs):
+        merged = None
+        with metrics.timed("tutor_llm_call_seconds", site=self.site):
+            for chunk in self.llm.stream(prompt, **kwargs):
+                merged = chunk if merged is None else merged + chunk
+                yield chunk
+        _record_usage(self.site, merged)
+
+    async def astream(self, prompt, **kwargs):
+        merged = None
+        with metrics.timed("tutor_llm_call_seconds", site=self.site):
+            async for chunk in self.llm.astream(prompt, **kwargs):
+                merged = chunk if merged is None else merged + chunk
+                yield chunk
+        _record_usage(self.site, merged)
+
+    def invoke_structured(self, schema, prompt):
+        with metrics.timed("tutor_llm_call_seconds", site=self.site):
+            result = self.llm.invoke_structured(schema, prompt)
+        metrics.increment("tutor_llm_calls_total", site=self.site, cache="n/a")
+        return result
+
+    def with_structured_output(self, schema, **kwargs):
+        runnable = self.llm.with_structured_output(schema, **kwargs)
+        site = self.site
+
+        class _Timed:
+            def invoke(self, prompt):
+                with metrics.timed("tutor_llm_call_seconds", site=site):
+                    result = runnable.invoke(prompt)
+                metrics.increment("tutor_llm_calls_total", site=site, cache="miss")
+                return result
+
+        return _Timed()
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+def llm_for(site, cached=False):
+    """The configured LLM (optionally behind the response cache), instrumented for this call site."""
+    return InstrumentedLLM(get_cached_llm() if cached else get_llm(), site)
+
+
+@st.cache_resource(show_spinner=False)
+def _openai_backend():
+    # langchain_openai is slow to import, so it is loaded with the first LLM call, once per process
+    from langchain_openai import ChatOpenAI
+
+    api_key = st.secrets.get("OPENAI_API_KEY") or os.environ.get("OPENAI_API_KEY")
+    # stream_usage so streamed calls report token counts too
+    return ChatOpenAI(model="gpt-4o", temperature=0.3, api_key=api_key, stream_usage=True)
+
+
+def _fake_backend():
+    from fake_llm import FakeChatModel
+
+    return FakeChatModel(latency=float(os.environ.get("FAKE_LLM_LATENCY", 0.05)))
+
+
+register_backend("openai", _openai_backend)
+register_backend("fake", _fake_backend)
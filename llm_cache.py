@@ -0,0 +1,188 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", ".llm_cache.sqlite")
+DEFAULT_TTL_SECONDS = int(os.environ.get("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+DEFAULT_MAX_DISK_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 50_000))
+DEFAULT_MAX_MEMORY_ENTRIES = 1024
+
+
+def normalize_prompt(prompt):
+    # Indentation and blank lines in the f-string prompts should not create separate entries
+    return " ".join(str(prompt).split())
+
+
+def cache_key(model, temperature, prompt):
+    return hashlib.sha256(f"{model}\x1f{temperature}\x1f{normalize_prompt(prompt)}".encode()).hexdigest()
+
+
+class LLMCache:
+    """In-process LRU in front of a SQLite store, with TTL and size-based eviction."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_disk_entries=DEFAULT_MAX_DISK_ENTRIES, max_memory_entries=DEFAULT_MAX_MEMORY_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.max_memory_entries = max_memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> (response, created_at)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache(last_access)")
+        self._db.commit()
+
+    def _remember(self, key, response, created_at):
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._db.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                entry = tuple(row) if row else None
+                if entry is not None:
+                    self._db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+
+            if entry is None or now - entry[1] > self.ttl_seconds:
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._remember(key, *entry)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        if count > self.max_disk_entries:
+            # Least recently used entries go first
+            self._db.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                (count - self.max_disk_entries,),
+            )
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+def _cached_message(content, chunk=False):
+    # Tagged so instrumentation can tell hits from provider calls
+    from langchain_core.messages import AIMessage, AIMessageChunk
+
+    return (AIMessageChunk if chunk else AIMessage)(content=content, response_metadata={"cache_hit": True})
+
+
+class CachedLLM:
+    """Wraps a chat model so invoke() of an identical prompt is served from the cache."""
+
+    def __init__(self, llm, cache):
+        self.llm = llm
+        self.cache = cache
+
+    def _key(self, prompt):
+        model = getattr(self.llm, "model_name", None) or getattr(self.llm, "model", type(self.llm).__name__)
+        return cache_key(model, getattr(self.llm, "temperature", None), prompt)
+
+    def invoke(self, prompt, **kwargs):
+        key = self._key(prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return _cached_message(cached)
+        response = self.llm.invoke(prompt, **kwargs)
+        self.cache.set(key, response.content)
+        return response
+
+    async def ainvoke(self, prompt, **kwargs):
+        key = self._key(prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return _cached_message(cached)
+        response = await self.llm.ainvoke(prompt, **kwargs)
+        self.cache.set(key, response.content)
+        return response
+
+    def stream(self, prompt, **kwargs):
+        # A hit arrives as one chunk; a miss streams through and is stored once complete
+        key = self._key(prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield _cached_message(cached, chunk=True)
+            return
+        parts = []
+        for chunk in self.llm.stream(prompt, **kwargs):
+            parts.append(chunk.content)
+            yield chunk
+        self.cache.set(key, "".join(parts))
+
+    async def astream(self, prompt, **kwargs):
+        key = self._key(prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield _cached_message(cached, chunk=True)
+            return
+        parts = []
+        async for chunk in self.llm.astream(prompt, **kwargs):
+            parts.append(chunk.content)
+            yield chunk
+        self.cache.set(key, "".join(parts))
+
+    def invoke_structured(self, schema, prompt):
+        # Structured output (a pydantic model) cached as its JSON
+        key = self._key(f"{schema.__name__}\n{prompt}")
+        cached = self.cache.get(key)
+        if cached is not None:
+            return schema.model_validate_json(cached)
+        result = self.llm.with_structured_output(schema).invoke(prompt)
+        self.cache.set(key, result.model_dump_json())
+        return result
+
+    def __getattr__(self, name):
+        # Everything else (with_structured_output, ...) goes to the wrapped model uncached
+        return getattr(self.llm, name)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    # One cache per server process, shared across all users
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
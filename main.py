@@ -1,20 +1,30 @@
 import os
-import traceback
 from dotenv import load_dotenv
 import streamlit as st
 from streamlit_ace import st_ace
 import streamlit_confetti
 import json
-from agent_graph import graph, llm, question_generator_node, hint_generator_node, answer_checker_node
-from helper_functions import  diagnose_failed_test_case, process_submission, init_static_session_state, load_user_into_session, is_output_equal
-from auth import check_login, update_user
-from preloaded_packages import preloaded_globals
+import asyncio
+import uuid
+from helper_functions import  adiagnose_failed_test_cases, asubmit, init_static_session_state, load_user_into_session, info_stream
+from auth import check_login
+from llm_backends import get_backend_name, llm_for
+from llm_cache import get_llm_cache
+import metrics
+import leaderboard
+import adaptive
+from user_store import get_user_store
+from learning_summary import get_learning_summary
+from history_store import load_history_page
+from sandbox import get_pool
+from test_runner import canonicalize_expected
+from question_prefetch import QuestionPrefetcher
 
 
 # Load environment variables
 load_dotenv()
-#pulling key from secrets
-openai_api_key = st.secrets["OPENAI_API_KEY"]
+#pulling key from secrets (only the OpenAI backend needs one)
+openai_api_key = st.secrets.get("OPENAI_API_KEY") if get_backend_name() == "openai" else "not-needed"
 if not openai_api_key:
     st.error("OpenAI API key is not set. Please set the OPENAI_API_KEY environment variable.")
     st.stop()
@@ -22,6 +32,10 @@ if not openai_api_key:
 #initiate session state
 init_static_session_state()
 
+# 📈 Optional Prometheus endpoint; started once per server process
+if os.environ.get("TUTOR_METRICS_PORT"):
+    metrics.start_exporter(int(os.environ["TUTOR_METRICS_PORT"]))
+
 
 
 # Check if user is logged in
@@ -34,13 +48,21 @@ logged_in = check_login()
 if not logged_in:
     st.stop()
 
+# 🐢 LangChain (via agent_graph) is slow to import, so it loads after the login page has rendered
+from agent_graph import question_generator_node, answer_checker_node, run_graph, acheck_answer, load_graph_state
+from grading import GRADING_MODE, fast_submit
+
 # Load user-dependent data into session after login
 load_user_into_session(st.session_state.user)
+user_store = get_user_store()
 
 # App title
 st.title("📚 Agentic AI Python Tutor")
 
 user = st.session_state.user
+# 🔁 Resume the question in progress (checkpointed per user) after a reconnect or on another replica
+if not st.session_state.graph_state.get("current_question"):
+    st.session_state.graph_state = load_graph_state(user["username"]) or st.session_state.graph_state
 # 🧠 Sync user profile from session state updates
 st.session_state.user["total_score"] = st.session_state.total_score
 st.session_state.user["streak"] = st.session_state.answer_streak
@@ -57,6 +79,28 @@ if st.session_state.get("logged_in"):
         if st.button("🚪 Log out"):
             logout()
 
+# 📈 Metrics panel for admins (TUTOR_ADMIN_USERS or st.secrets "admin_users", comma separated)
+admin_users = os.environ.get("TUTOR_ADMIN_USERS", "")
+if not admin_users:
+    try:
+        admin_users = st.secrets.get("admin_users") or ""
+    except FileNotFoundError:  # No secrets.toml, e.g. on the fake backend
+        pass
+if isinstance(admin_users, str):
+    admin_users = [name.strip() for name in admin_users.split(",") if name.strip()]
+if user["username"] in admin_users:
+    with st.sidebar.expander("📈 Metrics"):
+        st.caption(f"LLM cache: {get_llm_cache().stats()}")
+        st.dataframe(
+            [{"metric": name, "labels": ", ".join(f"{k}={v}" for k, v in labels.items()),
+              "count": count, "total": round(total, 4)} for name, labels, count, total in metrics.snapshot()],
+            hide_index=True,
+        )
+        st.code(metrics.render_prometheus(), language="text")
+
+# Questions with more test cases than this spread them across sandbox workers
+PARALLEL_TEST_THRESHOLD = 3
+
 TOPICS = ["General", "Strings", "Lists & Dictionaries", "Loops", "Pandas", "Numpy", "Data Structures", "Recursion"]
 
 # UI: Topic and Difficulty Selection
@@ -67,6 +111,20 @@ selected_topic = st.selectbox(
     key="selected_topic"
 )
 
+# 🏆 Leaderboard: top entries and the user's rank, read from boards kept up to date on every submission
+with st.sidebar.expander("🏆 Leaderboard", expanded=True):
+    boards = {"This week": leaderboard.week_board(), "All time": leaderboard.ALL_TIME,
+              selected_topic: leaderboard.topic_board(selected_topic)}
+    board_name = st.radio("Board", list(boards), horizontal=True, key="leaderboard_board",
+                          label_visibility="collapsed")
+    entries = leaderboard.top(boards[board_name])
+    if entries:
+        st.dataframe([{"#": e["rank"], "Name": e["name"], "Score": e["score"]} for e in entries], hide_index=True)
+    else:
+        st.caption("No scores yet. Be the first!")
+    mine = leaderboard.rank(boards[board_name], user["username"])
+    st.caption(f"Your rank: **#{mine[0]}** with {mine[1]} points" if mine else "Solve a question to join this board.")
+
 prev_difficulty = st.session_state.graph_state.get("difficulty", "easy")
 selected_difficulty = st.selectbox(
     "Choose your starting difficulty level:",
@@ -75,22 +133,57 @@ selected_difficulty = st.selectbox(
     key="difficulty_selector"
 )
 
+# 🎚️ Local policy over the user's mastery aggregates: no LLM call, no history scan
+if st.toggle("🎚️ Let the tutor pick the topic and difficulty", key="adaptive_mode"):
+    selected_topic, selected_difficulty, reason = adaptive.recommend(user, TOPICS)
+    st.caption(f"Next up: **{selected_topic}** at **{selected_difficulty}**. {reason}")
+performance = adaptive.performance_summary(user, selected_topic)
+
 # Button to generate a new question
 generate_new = st.button("🎯 Generate New Question")
 
+if "question_prefetcher" not in st.session_state:
+    st.session_state.question_prefetcher = QuestionPrefetcher(question_generator_node)
+
+
+def current_question_text():
+    return (st.session_state.graph_state.get("current_question") or {}).get("question")
+
+def apply_background_result(submission):
+    # Waits for the submission's background AI feedback and summary fold, then applies both
+    future, submission["future"] = submission["future"], None
+    try:
+        background = future.result()
+    except Exception:
+        background = {"feedback": "AI feedback is unavailable right now.", "learning_summary": None}
+    submission["ai_feedback"] = background["feedback"]
+    if background["learning_summary"]:
+        user["learning_summary"] = background["learning_summary"]
+    if background["feedback"]:
+        st.session_state.graph_state = run_graph("update", user["username"], question=submission.get("question"),
+                                                 feedback=background["feedback"])
 
 if generate_new:
-    # Clear previous solution if present
-    st.session_state.graph_state.pop("solution", None)
-    st.session_state.graph_state["difficulty"] = selected_difficulty
-    st.session_state.graph_state["topic"] = selected_topic
-    st.session_state.graph_state = question_generator_node(st.session_state.graph_state)
+    # 🧠 A summary fold still running for the last submission is kept, not thrown away and redone
+    last_submission = st.session_state.pop("last_submission", None)
+    if last_submission is not None and last_submission["future"] is not None:
+        with st.spinner("Saving your last submission..."):
+            apply_background_result(last_submission)
+    # ⚡ Serve a question generated in the background if one is ready; the graph clears the previous answer
+    prefetched = st.session_state.question_prefetcher.pop(selected_topic, selected_difficulty, current_question_text())
+    st.session_state.graph_state = run_graph(
+        "generate", user["username"], difficulty=selected_difficulty, topic=selected_topic, prefetched=prefetched,
+        performance=performance,
+    )
     st.session_state.hints_used = 0
     st.session_state.show_confetti = False
-    st.session_state.graph_state.pop("user_answer", None)
-    st.session_state.graph_state.pop("answer_correct", None)
 
-if "current_question" not in st.session_state.graph_state:
+# Keep the next questions for the current selection generating while the user works
+st.session_state.question_prefetcher.prefetch(
+    selected_topic, selected_difficulty, user["username"], performance, current_question_text()
+)
+
+if not st.session_state.graph_state.get("current_question"):
     st.info("👋 Select a topic and difficulty, then click **Generate New Question** to begin.")
     st.stop()
 
@@ -141,88 +234,65 @@ user_code = st_ace(
 if user_code:
     st.code(user_code, language="python")
 
-# Save user code to session state
-update_user(st.session_state.user)
-
 st.subheader("🔁 Execute Code")
 
-# Shared execution context
-exec_context = preloaded_globals.copy()
-exec_context["__builtins__"] = __builtins__
+# User code never runs in this process: a shared pool of sandboxed workers executes it
+sandbox = get_pool()
 
 # Handle Code Execution (no test cases)
 if st.button("▶️ Execute Code (no test cases)"):
-    try:
-        output_buffer = []
-
-        # Capture print statements
-        def custom_print(*args, **kwargs):
-            output_buffer.append(" ".join(str(arg) for arg in args))
-
-        exec_context["print"] = custom_print
-        exec(user_code, exec_context, exec_context)
-
-        if output_buffer:
+    run = sandbox.run_code(user_code or "")
+    if run["ok"]:
+        if run["stdout"]:
             st.markdown("🖨️ Output from your code:")
-            for line in output_buffer:
+            for line in run["stdout"].splitlines():
                 st.text(line)
         else:
             st.info("✅ Code executed successfully, but nothing was printed.")
-    except Exception as e:
-        st.error(f"❌ Error during code execution: {e}")
-        st.text(traceback.format_exc())
+    else:
+        st.error(f"❌ Error during code execution: {run['error']}")
+        if run["traceback"]:
+            st.text(run["traceback"])
+
+stop_on_failure = st.checkbox("⏩ Stop at the first failing test case", key="fail_fast")
+profile_complexity = st.checkbox("📈 Measure time complexity once all tests pass", key="profile_complexity")
 
 # Handle Test Case Execution
 if st.button("🧪 Run Test Cases"):
-    try:
-        # Unified exec context with custom print
-        exec_context = preloaded_globals.copy()
-        exec_context["__builtins__"] = __builtins__
-        output_buffer = []
-
-        def custom_print(*args, **kwargs):
-            output_buffer.append(" ".join(str(arg) for arg in args))
-
-        exec_context["print"] = custom_print
-
-        # Execute user code (defines all functions)
-        exec(user_code, exec_context, exec_context)
+    profile = None
+    if "expected_values" not in question_data:
+        question_data["expected_values"] = canonicalize_expected(question_data["test_cases"])
+    run = sandbox.run_tests(
+        user_code or "",
+        question_data["test_cases"],
+        expected_values=question_data["expected_values"],
+        parallel=len(question_data["test_cases"]) > PARALLEL_TEST_THRESHOLD,
+        fail_fast=stop_on_failure,
+    )
 
+    if not run["ok"]:
+        st.error(f"⚠️ Error during test execution: {run['error']}")
+        if run["traceback"]:
+            st.text(run["traceback"])
+        st.session_state.graph_state["answer_correct"] = False
+    else:
         test_results = []
         failed_cases = []
 
-        for test_case in question_data["test_cases"]:
-            input_str = test_case["input"]
-            expected_output_str = test_case["expected_output"]
-
-            st.write(f"🔎 Running: `{input_str}`")
+        for record in run["results"]:
+            if record["skipped"]:
+                st.write(f"⏭️ Skipped: `{record['input']}`")
+                continue
+            st.write(f"🔎 Running: `{record['input']}`")
 
-            try:
-                expected_output = eval(expected_output_str, exec_context)
-            except Exception as e:
-                st.error(f"❌ Failed to evaluate expected output: `{expected_output_str}`")
-                st.error(str(e))
+            if record["expected_error"]:
+                st.error(f"❌ Failed to evaluate expected output: `{record['expected']}`")
+                st.error(record["expected_error"])
                 continue
 
-            try:
-                actual_output = eval(input_str, exec_context)
-                result = is_output_equal(actual_output, expected_output)
-                test_results.append(result)
-
-                if not result:
-                    failed_cases.append({
-                        "input": input_str,
-                        "expected": expected_output,
-                        "actual": actual_output
-                    })
-
-            except Exception as e:
-                test_results.append(False)
-                failed_cases.append({
-                    "input": input_str,
-                    "expected": expected_output,
-                    "actual": f"Error: {e}"
-                })
+            test_results.append(record["passed"])
+            if not record["passed"]:
+                failed_cases.append(record)
 
         # Evaluate test results
         if all(test_results):
@@ -230,33 +300,52 @@ if st.button("🧪 Run Test Cases"):
             st.session_state.show_confetti = True
             streamlit_confetti.confetti(emojis=["🎉", "✨", "🏆", "💥", "🥳"])
             st.session_state.graph_state["answer_correct"] = True
+
+            if profile_complexity:
+                # 📈 Time the function on inputs scaled from the test cases, n = 10^2 ... 10^6
+                with st.spinner("Measuring how your solution scales..."):
+                    profiled = sandbox.profile(user_code or "", question_data["test_cases"])
+                profile = profiled.get("profile") if profiled["ok"] else None
+                if profile and profile["complexity"]:
+                    largest = profile["points"][-1]
+                    st.info(
+                        f"📈 Estimated time complexity: **{profile['complexity']}** "
+                        f"(growth exponent {profile['exponent']}), memory: **{profile['memory_complexity']}**. "
+                        f"At n = {largest['n']:,}: {largest['seconds'] * 1000:.2f} ms, "
+                        f"peak {largest['peak_bytes'] / 1024:.0f} KiB."
+                    )
+                    st.dataframe(
+                        [{"n": p["n"], "ms": round(p["seconds"] * 1000, 3), "peak KiB": round(p["peak_bytes"] / 1024, 1)}
+                         for p in profile["points"]],
+                        hide_index=True,
+                    )
+                else:
+                    st.warning(f"📈 Could not measure the complexity: "
+                               f"{profile['reason'] if profile else profiled['error']}")
         else:
             st.session_state.show_confetti = False
             st.session_state.graph_state["answer_correct"] = False
             st.error(f"❌ {len(failed_cases)} test case(s) failed.")
 
+            renders = []
             for i, fc in enumerate(failed_cases, 1):
                 st.markdown(f"### 🔍 Failed Test Case {i}")
                 st.markdown(f"**Input:** `{fc['input']}`")
                 st.markdown(f"**Expected Output:** `{fc['expected']}`")
                 st.markdown(f"**Actual Output:** `{fc['actual']}`")
+                renders.append(info_stream())
 
-            fc = failed_cases[0]
-            diagnosis = diagnose_failed_test_case(
-                user_code=user_code,
-                input_data=fc["input"],
-                expected_output=fc["expected"],
-                actual_output=fc["actual"],
-                llm=llm
-            )
-            st.info(diagnosis)
-
-        st.session_state.graph_state["user_answer"] = user_code
-
-    except Exception as e:
-        st.error(f"⚠️ Error during test execution: {e}")
-        st.text(traceback.format_exc())
-        st.session_state.graph_state["answer_correct"] = False
+            # 🩺 Diagnose every failing case concurrently, each streaming into its own box
+            asyncio.run(adiagnose_failed_test_cases(user_code, failed_cases, llm_for("diagnose", cached=True), renders=renders))
+
+    # Checkpoint the run result so a rerun or reconnect can still submit it
+    st.session_state.graph_state = run_graph(
+        "update", user["username"], question=question_data["question"],
+        answer_correct=st.session_state.graph_state.get("answer_correct"), user_answer=user_code, profile=profile,
+        test_run=uuid.uuid4().hex,
+    )
+    if current_question_text() != question_data["question"]:
+        st.warning("⚠️ This question was replaced in another tab, so this test run was not saved.")
 
 
 if st.session_state.get("show_confetti"):
@@ -268,11 +357,11 @@ if st.session_state.get("show_confetti"):
 
 # Hint button
 if st.button("Get Hint"):
-    st.session_state.graph_state = hint_generator_node(st.session_state.graph_state)
+    # The hint streams into the info box as it is generated
+    st.session_state.graph_state = run_graph("hint", user["username"], render=info_stream("💡 Hint: "))
     hint = st.session_state.graph_state.get("hint", "")
     if hint:
         st.session_state.hints_used += 1
-        st.info(f"💡 Hint: {hint}")
     else:
         st.warning("No hint available.")
 
@@ -282,67 +371,102 @@ with col1:
     submit_clicked = st.button("✅ Submit Your Solution", key="submit_button", use_container_width=True)
 with col2:
     show_clicked = st.button("🧠 Show Solution", key="show_button", use_container_width=True)
+ai_feedback = st.toggle("💬 AI feedback on my submission", value=True, key="ai_feedback")
+
+def bonus_note(result):
+    bonus = result.get("efficiency_bonus")
+    return f" (including a {bonus}-point efficiency bonus 🏎️)" if bonus else ""
 
 # Handle Submit
 if submit_clicked:
-    if "answer_correct" not in st.session_state.graph_state:
+    if st.session_state.graph_state.get("answer_correct") is None:
         st.warning("⚠️ Please run test cases before submitting your solution.")
+    elif GRADING_MODE == "fast":
+        # ⚡ Score and static feedback right away; the AI comment and summary update follow in the background
+        st.session_state.last_submission = fast_submit(
+            st.session_state.graph_state, st.session_state.user,
+            check_answer=answer_checker_node if ai_feedback else None, summary_llm=llm_for("summary"),
+        )
+        # Its feedback is only checkpointed while this question is still the current one
+        st.session_state.last_submission["question"] = question_data["question"]
+        st.session_state.pop("history_pages", None)
     else:
-        st.session_state.graph_state = answer_checker_node(st.session_state.graph_state)
-        result = process_submission(st.session_state.graph_state, st.session_state.user)
+        # Reserve the result line above the feedback that streams in below it
+        result_box = st.empty()
+        # Feedback streams in while the submission is recorded and the summary is updated
+        result = asyncio.run(asubmit(
+            st.session_state.graph_state, st.session_state.user, acheck_answer, llm_for("summary"),
+            render=info_stream("💬 Feedback: ")
+        ))
+        # Loaded history pages are stale once a new question is recorded
+        st.session_state.pop("history_pages", None)
+
+        if result["answer_correct"]:
+            result_box.success(f"🎉 Correct! You earned {result['score']} points.{bonus_note(result)}")
+        else:
+            result_box.error(f"❌ Incorrect. Please try again {st.session_state.user.get('name', '')}.")
 
-    if result["answer_correct"]:
-        st.success(f"🎉 Correct! You earned {result['score']} points.")
-    else:
-        st.error(f"❌ Incorrect. Please try again {st.session_state.user.get('name', '')}.")
+        st.markdown(f"**Total Score:** `{st.session_state.total_score}` | **Streak:** `{st.session_state.answer_streak}`")
 
-    update_user(st.session_state.user)
+submission = st.session_state.get("last_submission")
+if submission is not None:
+    # Polls while the background feedback is pending, then stays static
+    @st.fragment(run_every=1 if submission["future"] is not None else None)
+    def show_submission():
+        if submission["answer_correct"]:
+            st.success(f"🎉 Correct! You earned {submission['score']} points.{bonus_note(submission)}")
+        else:
+            st.error(f"❌ Incorrect. Please try again {user.get('name', '')}.")
+        st.markdown(f"**Total Score:** `{user['total_score']}` | **Streak:** `{user['streak']}`")
+        st.markdown(f"🔎 {submission['feedback']}")
 
-    if result["feedback"]:
-        st.info(f"💬 Feedback: {result['feedback']}")
+        future = submission["future"]
+        if future is not None and future.done():
+            apply_background_result(submission)
+            st.rerun()  # Whole app: the summary is refreshed, the changes flushed and polling stops
+        if future is not None:
+            st.caption("💬 AI feedback is on its way…")
+        elif submission.get("ai_feedback"):
+            st.info(f"💬 Feedback: {submission['ai_feedback']}")
 
-    st.markdown(f"**Total Score:** `{st.session_state.total_score}` | **Streak:** `{st.session_state.answer_streak}`")
+    show_submission()
 
 # Handle Show Solution
 if show_clicked:
-    question_text = st.session_state.graph_state["current_question"]["question"]
-    prompt = f"""
-    You are a helpful Python tutor. Here is the question:\n\n{question_text}\n\n
-    Provide the final solution as code.
-    """
-    solution = llm.invoke(prompt).content.strip()
     st.subheader("🧪 Solution:")
-    st.code(solution)
+    st.session_state.graph_state = run_graph("solution", user["username"], render=st.write_stream)
 
 # ============================
 # 📘 Learning History & Summary
 # ============================
 
 st.markdown("---")
-st.subheader("🧠 Your Learning Summary")
+st.subheader("📊 Your Progress")
 
-if user.get("answered_questions"):
-    all_questions = "\n".join(
-        f"- {q['question']} ({q.get('topic', 'General')}, {q.get('difficulty', 'easy')})"
-        for q in user["answered_questions"]
-    )
-
-    summary_prompt = f"""
-    Summarize what the user has learned based on these Python practice questions. Be brief and encouraging. Never go beyond 30 words.
-    Suggest next steps based on their topics and difficulty levels.
-    User's Total Score: {user.get('total_score', 0)} | Current Streak: {user.get('streak', 0)}
-    User's Last Answered Question:{user.get('last_answered_question', 'Not available')}
-    User's Hints Used: {user.get('hints_used', 0)}
+# Rendered from the per-topic aggregates, so it costs nothing however long the history is
+progress = adaptive.topic_stats(user)
+if progress:
+    st.dataframe(progress, hide_index=True)
+else:
+    st.caption("Submit a solution to start tracking your progress.")
 
-    Questions:
-    {all_questions}
-    """
+st.subheader("🧠 Your Learning Summary")
 
-    summary = llm.invoke(summary_prompt).content.strip()
+# Summary is cached on the user and only recomputed when a new question is answered
+if submission is not None and submission["future"] is not None:
+    # 🔄 The last submission is still folding itself into the summary in the background
+    summary = (user.get("learning_summary") or {}).get("text", "")
+else:
+    summary = get_learning_summary(
+        user, llm_for("summary"), lambda n: load_history_page(user["username"], page_size=n)[0]
+    )
+if summary:
     st.success(summary)
 
 with st.expander("📂 View All Answered Questions & Code", expanded=False):
-    for idx, q in enumerate(user.get("answered_questions", [])[::-1], 1):  # Latest first
+    # History lives in a subcollection and is only fetched page by page on request
+    history = st.session_state.setdefault("history_pages", {"records": [], "cursor": None, "done": False})
+    for idx, q in enumerate(history["records"], 1):  # Latest first
         st.markdown(f"### {idx}. {q.get('question', 'No question text')}")
         st.markdown(f"**Topic:** `{q.get('topic', 'N/A')}` | **Difficulty:** `{q.get('difficulty', 'N/A')}` | **Points:** `{q.get('points_possible', '?')}`")
         st.markdown("**Test Case Example:**")
@@ -353,6 +477,20 @@ with st.expander("📂 View All Answered Questions & Code", expanded=False):
             st.code(q["user_code"], language="python")
         st.markdown("---")
 
+    if user.get("answered_count", 0) and not history["done"]:
+        label = "📥 Load more" if history["records"] else "📥 Load answered questions"
+        if st.button(label, key="load_history"):
+            records, cursor = load_history_page(user["username"], start_after=history["cursor"])
+            history["records"].extend(records)
+            history["cursor"] = cursor
+            history["done"] = cursor is None
+            st.rerun()
+    elif not user.get("answered_count", 0):
+        st.caption("No answered questions yet.")
+
+# 💾 One coalesced write per interaction, and only for fields that changed
+user_store.flush()
+
 st.markdown("---")
 st.subheader("About This App")
 st.markdown("source code: https://github.com/Ajith-s/ai-python-tutor")
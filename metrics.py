@@ -0,0 +1,125 @@
+"""In-process metrics: counters and histograms with labels, exported in the Prometheus text format."""
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "tutor_llm_call_seconds": "Duration of LLM calls by call site.",
+    "tutor_llm_calls_total": "LLM calls by call site and cache outcome.",
+    "tutor_llm_tokens_total": "LLM tokens by call site and direction.",
+    "tutor_question_generation_attempts_total": "Question generation attempts by outcome.",
+    "tutor_question_generation_exhausted_total": "Question generations that ran out of retries.",
+    "tutor_questions_served_total": "Questions served by source (question bank or LLM).",
+    "tutor_code_execution_seconds": "Sandboxed code execution time by job kind and outcome.",
+    "tutor_firestore_seconds": "Duration of Firestore calls by operation.",
+    "tutor_user_cache_total": "User profile lookups by in-process cache outcome.",
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def increment(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * len(DEFAULT_BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+
+@contextmanager
+def timed(name, **labels):
+    """Observe the duration of the block; labels may be updated inside it (e.g. an outcome)."""
+    start = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def snapshot():
+    """Rows of (name, labels, count, total) for display; counters have total == count."""
+    with _lock:
+        rows = [(name, dict(labels), value, value) for (name, labels), value in _counters.items()]
+        rows += [(name, dict(labels), series[-1], series[-2]) for (name, labels), series in _histograms.items()]
+    return sorted(rows, key=lambda row: (row[0], sorted(row[1].items())))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(series) for key, series in _histograms.items()}
+
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+        for (series_name, labels), value in sorted(counters.items()):
+            if series_name == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    for name in sorted({name for name, _ in histograms}):
+        lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} histogram"]
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            for bound, count in zip(DEFAULT_BUCKETS, series):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {series[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {series[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_exporter = None
+
+
+def start_exporter(port):
+    """Serve /metrics on the given port from a daemon thread (once per process)."""
+    global _exporter
+    with _lock:
+        if _exporter is None:
+            _exporter = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            threading.Thread(target=_exporter.serve_forever, name="metrics-exporter", daemon=True).start()
+    return _exporter
@@ -0,0 +1,182 @@
+# Kept free of streamlit/firebase imports so sandbox workers can load it cheaply
+import math
+import numbers
+import sys
+from collections import Counter
+
+# Tolerance and ordering policy; a test case can override any of these with a "compare" dict,
+# e.g. {"input": "...", "expected_output": "...", "compare": {"ordered": true, "rtol": 1e-3}}
+DEFAULT_POLICY = {
+    "rtol": 1e-5,
+    "atol": 1e-5,
+    "ordered": False,            # Lists: compare element by element instead of as multisets (tuples always are)
+    "check_dtype": False,        # ndarrays and pandas objects: dtypes must match too
+    "check_index": True,         # pandas: compare the index, not just the values
+    "check_row_order": True,     # pandas: rows must be in the same order
+    "check_column_order": False, # DataFrames: columns may come in any order
+}
+
+
+def _module(name):
+    # Only loaded modules matter: without numpy imported, nothing can be an ndarray
+    return sys.modules.get(name)
+
+
+def _is_ndarray(value):
+    np = _module("numpy")
+    return np is not None and isinstance(value, np.ndarray)
+
+
+def _is_pandas(value):
+    pd = _module("pandas")
+    return pd is not None and isinstance(value, (pd.DataFrame, pd.Series))
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, complex)
+
+
+def _numbers_equal(actual, expected, policy):
+    # Integer answers must match exactly; the tolerance is only for floats
+    if isinstance(actual, numbers.Integral) and isinstance(expected, numbers.Integral):
+        return actual == expected
+    try:
+        if math.isnan(actual) or math.isnan(expected):
+            return math.isnan(actual) and math.isnan(expected)
+        return math.isclose(actual, expected, rel_tol=policy["rtol"], abs_tol=policy["atol"])
+    except OverflowError:  # An int beyond float range against a float
+        return actual == expected
+
+
+def _arrays_equal(actual, expected, policy):
+    np = _module("numpy")
+    try:
+        actual, expected = np.asarray(actual), np.asarray(expected)
+    except (ValueError, TypeError):  # Ragged nested lists cannot be arrays, so they cannot match one
+        return False
+    if actual.shape != expected.shape:
+        return False
+    if policy["check_dtype"] and actual.dtype != expected.dtype:
+        return False
+    if np.issubdtype(actual.dtype, np.number) and np.issubdtype(expected.dtype, np.number):
+        return bool(np.allclose(actual, expected, rtol=policy["rtol"], atol=policy["atol"], equal_nan=True))
+    return bool(np.array_equal(actual, expected))
+
+
+def _to_pandas(value, like):
+    pd = _module("pandas")
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value
+    # Literal expected outputs: a dict/list becomes the same kind of object as the actual one
+    return pd.DataFrame(value) if isinstance(like, pd.DataFrame) else pd.Series(value)
+
+
+def _pandas_equal(actual, expected, policy):
+    pd = _module("pandas")
+    try:
+        actual, expected = _to_pandas(actual, expected), _to_pandas(expected, actual)
+    except (ValueError, TypeError):
+        return False
+    if type(actual) is not type(expected):
+        return False
+    if not policy["check_index"]:
+        actual, expected = actual.reset_index(drop=True), expected.reset_index(drop=True)
+    elif not policy["check_row_order"]:
+        actual, expected = actual.sort_index(), expected.sort_index()
+    assert_equal = pd.testing.assert_frame_equal if isinstance(actual, pd.DataFrame) else pd.testing.assert_series_equal
+    options = {"check_dtype": policy["check_dtype"], "rtol": policy["rtol"], "atol": policy["atol"],
+               "check_names": False}
+    if isinstance(actual, pd.DataFrame):
+        options["check_like"] = not policy["check_column_order"]
+    try:
+        assert_equal(actual, expected, **options)
+        return True
+    except (AssertionError, TypeError, ValueError):
+        return False
+
+
+def _freeze(value):
+    # Hashable stand-in so collections can be counted as multisets
+    if isinstance(value, dict):
+        return frozenset((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(_freeze(v) for v in value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _multisets_equal(actual, expected, policy):
+    if len(actual) != len(expected):
+        return False
+    try:
+        # Orderable elements: C-level sort beats hashing for plain ints/strings
+        if sorted(actual) == sorted(expected):
+            return True
+    except (TypeError, ValueError):
+        pass  # Mixed types such as [1, "a", None] cannot be sorted
+    try:
+        # Linear time: counts of hashable stand-ins (nested lists, dicts, padded strings)
+        if Counter(map(_freeze, actual)) == Counter(map(_freeze, expected)):
+            return True
+    except TypeError:
+        pass  # Unhashable elements (e.g. arrays): pair them up below
+    if all(_is_number(v) for v in actual) and all(_is_number(v) for v in expected):
+        # Exact counts failed; numbers may still match within tolerance once sorted
+        return all(_numbers_equal(a, e, policy) for a, e in zip(sorted(actual), sorted(expected)))
+    remaining = list(expected)
+    for item in actual:
+        match = next((i for i, candidate in enumerate(remaining) if compare(item, candidate, policy)), None)
+        if match is None:
+            return False
+        remaining.pop(match)
+    return True
+
+
+def compare(actual, expected, policy):
+    """Type-dispatched equality under a full policy dict (see DEFAULT_POLICY)."""
+    if _is_pandas(actual) or _is_pandas(expected):
+        return _pandas_equal(actual, expected, policy)
+    if _is_ndarray(actual) or _is_ndarray(expected):
+        return _arrays_equal(actual, expected, policy)
+
+    # Handle numeric comparison with tolerance (numpy scalars included)
+    if _is_number(actual) and _is_number(expected):
+        return _numbers_equal(actual, expected, policy)
+
+    # Handle strings: ignore leading/trailing whitespace
+    if isinstance(actual, str) and isinstance(expected, str):
+        return actual.strip() == expected.strip()
+
+    # Only the top-level collection may be unordered: nested lists (rows, pairs) keep their order
+    nested = policy if policy["ordered"] else {**policy, "ordered": True}
+
+    # Handle dicts key by key, so nested floats get the tolerance too
+    if isinstance(actual, dict) and isinstance(expected, dict):
+        return actual.keys() == expected.keys() and all(compare(actual[k], expected[k], nested) for k in actual)
+
+    # Tuples are positional (pairs, records), so they keep their order whatever the policy says
+    sequences = (list, tuple)
+    if isinstance(actual, sequences) and isinstance(expected, sequences) and \
+            (policy["ordered"] or isinstance(actual, tuple) or isinstance(expected, tuple)):
+        return len(actual) == len(expected) and all(compare(a, e, nested) for a, e in zip(actual, expected))
+
+    # Unordered collections (and sets against lists) compare as multisets
+    collections = (list, set, frozenset)
+    if isinstance(actual, collections) and isinstance(expected, collections):
+        if isinstance(actual, (set, frozenset)) and isinstance(expected, (set, frozenset)):
+            return actual == expected or _multisets_equal(list(actual), list(expected), nested)
+        return _multisets_equal(list(actual), list(expected), nested)
+
+    # Final fallback: strict equality, guarding against array-like results of ==
+    try:
+        return bool(actual == expected)
+    except (ValueError, TypeError):
+        return False
+
+
+def is_output_equal(actual, expected, policy=None):
+    """Whether the student's result matches the expected one; policy overrides DEFAULT_POLICY entries."""
+    return compare(actual, expected, {**DEFAULT_POLICY, **(policy or {})})
@@ -1,11 +1,34 @@
+import importlib
 import math
-import pandas as pd
-import numpy as np
 import random
 import json
 import datetime as dt
 import collections
 
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def resolve(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'>"
+
+
+# 🐢 pandas/numpy are only imported when code actually uses them
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
+
 preloaded_globals = {
     "__builtins__": __builtins__,  # Allow built-in functions like len, range, etc.
     "pd": pd,
@@ -15,4 +38,12 @@ preloaded_globals = {
     "json": json,
     "datetime": dt,
     "collections": collections,
-}
\ No newline at end of file
+}
+
+
+def resolved_globals():
+    """preloaded_globals with the real modules, for sandbox workers (where they are preloaded)."""
+    return {
+        name: value.resolve() if isinstance(value, LazyModule) else value
+        for name, value in preloaded_globals.items()
+    }
@@ -151,7 +151,9 @@ QUESTION_BANK = [
 ]
 
 def get_question_by_difficulty(level):
-    return [q for q in QUESTION_BANK if q['difficulty'] == level]
+    # Served from the indexed question store (seeded from this list) instead of scanning it
+    from question_store import get_question_store
+    return list(get_question_store().iter_questions(difficulty=level))
 
 def get_all_questions():
     return QUESTION_BANK
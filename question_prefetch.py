@@ -0,0 +1,86 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from history_store import question_key
+
+PREFETCH_DEPTH = 2
+MAX_CLAIM_ATTEMPTS = 3  # Generations per queued question when another one got the same question first
+
+# Shared by all sessions so background generation stays bounded per server process
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="question-prefetch")
+
+
+class QuestionPrefetcher:
+    """Per-session queue of questions generated in the background for the selected topic and difficulty."""
+
+    def __init__(self, generate, depth=PREFETCH_DEPTH):
+        self._generate = generate  # question_generator_node
+        self._depth = depth
+        self._key = None
+        self._futures = deque()
+        # Questions already on screen or in the queue (question key -> text), so none is served twice
+        self._claimed = {}
+        self._lock = threading.Lock()
+
+    def _claim(self, text):
+        # False when the question was already claimed (e.g. a concurrent task picked it first)
+        with self._lock:
+            if question_key(text) in self._claimed:
+                return False
+            self._claimed[question_key(text)] = text
+            return True
+
+    def _generate_question(self, topic, difficulty, username, performance):
+        # Runs on a worker thread: it gets its own state dict and never touches st.session_state
+        for _ in range(MAX_CLAIM_ATTEMPTS):
+            with self._lock:
+                exclude = list(self._claimed.values())
+            state = self._generate({"topic": topic, "difficulty": difficulty, "username": username,
+                                    "performance": performance, "exclude_questions": exclude})
+            question = state.get("current_question", {})
+            if not question.get("test_cases"):
+                return None
+            if self._claim(question["question"]):
+                return question
+        return None
+
+    def _switch_to(self, topic, difficulty):
+        if self._key != (topic, difficulty):
+            self.invalidate()
+            self._key = (topic, difficulty)
+
+    def prefetch(self, topic, difficulty, username, performance=None, current_question=None):
+        """Top the queue up to depth; a topic or difficulty change discards queued questions.
+
+        current_question is the text on screen, which queued questions must not repeat.
+        """
+        self._switch_to(topic, difficulty)
+        if current_question:
+            self._claim(current_question)
+        while len(self._futures) < self._depth:
+            self._futures.append(
+                _executor.submit(self._generate_question, topic, difficulty, username, performance)
+            )
+
+    def pop(self, topic, difficulty, current_question=None):
+        """Return a ready question for this selection other than current_question, or None if none has finished yet."""
+        self._switch_to(topic, difficulty)
+        current = question_key(current_question) if current_question else None
+        for future in list(self._futures):
+            if not future.done():
+                continue
+            self._futures.remove(future)
+            question = future.result() if future.exception() is None else None
+            # Generated before the question on screen was known, so it may be that very question
+            if question is not None and question_key(question["question"]) != current:
+                return question
+        return None
+
+    def invalidate(self):
+        for future in self._futures:
+            future.cancel()
+        self._futures.clear()
+        self._key = None
+        with self._lock:
+            self._claimed.clear()
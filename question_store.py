@@ -0,0 +1,175 @@
+"""On-disk question store: SQLite with a (topic, difficulty) index.
+
+Questions are read page by page through the index, so a bank of 100k+ questions never has to be
+loaded into memory. The store is seeded once from question_bank.QUESTION_BANK (unvetted); vetted
+questions come from generate_bank.py.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from history_store import question_key
+
+DEFAULT_STORE_PATH = os.environ.get("QUESTION_STORE_PATH", "question_store.sqlite")
+PAGE_SIZE = 50
+MAX_CANDIDATES = 500  # Unseen-question search gives up after this many rows
+
+# Topics as the UI names them and as older bank entries spell them map onto one key
+TOPIC_ALIASES = {
+    "lists & dictionaries": "lists",
+    "dictionaries": "lists",
+    "dicts": "lists",
+    "arrays": "lists",
+    "searching": "algorithms",
+    "sorting": "algorithms",
+}
+ANY_TOPIC = "general"
+
+
+def normalize_topic(topic):
+    topic = " ".join(str(topic or ANY_TOPIC).split()).lower()
+    return TOPIC_ALIASES.get(topic, topic)
+
+
+def normalize_difficulty(difficulty):
+    return str(difficulty or "easy").strip().lower()
+
+
+class QuestionStore:
+    """Questions indexed by normalized (topic, difficulty) and vetted flag."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS questions ("
+            "id INTEGER PRIMARY KEY, topic TEXT NOT NULL, difficulty TEXT NOT NULL, "
+            "question_key TEXT NOT NULL UNIQUE, question TEXT NOT NULL, payload TEXT NOT NULL, "
+            "vetted INTEGER NOT NULL DEFAULT 0, source TEXT, created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS questions_by_topic ON questions(topic, difficulty, vetted, id)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS questions_by_difficulty ON questions(difficulty, vetted, id)")
+        self._db.commit()
+
+    def add(self, question, vetted=False, source=None, commit=True):
+        """Insert a question dict (question, topic, difficulty, test_cases, ...); returns its id, or None for a duplicate."""
+        payload = {k: v for k, v in question.items() if k not in ("id", "question", "topic", "difficulty")}
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO questions "
+                "(topic, difficulty, question_key, question, payload, vetted, source, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    normalize_topic(question.get("topic")), normalize_difficulty(question.get("difficulty")),
+                    question_key(question["question"]), question["question"],
+                    json.dumps(payload), int(vetted), source, time.time(),
+                ),
+            )
+            if commit:
+                self._db.commit()
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def add_many(self, questions, vetted=False, source=None):
+        ids = [self.add(q, vetted=vetted, source=source, commit=False) for q in questions]
+        with self._lock:
+            self._db.commit()
+        return [i for i in ids if i is not None]
+
+    def contains(self, question_text):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM questions WHERE question_key = ?", (question_key(question_text),)
+            ).fetchone()
+        return row is not None
+
+    def _where(self, topic=None, difficulty=None, vetted=None):
+        clauses, params = [], []
+        if topic is not None and normalize_topic(topic) != ANY_TOPIC:
+            clauses.append("topic = ?")
+            params.append(normalize_topic(topic))
+        if difficulty is not None:
+            clauses.append("difficulty = ?")
+            params.append(normalize_difficulty(difficulty))
+        if vetted is not None:
+            clauses.append("vetted = ?")
+            params.append(int(vetted))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, topic=None, difficulty=None, vetted=None):
+        where, params = self._where(topic, difficulty, vetted)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM questions{where}", params).fetchone()[0]
+
+    def iter_questions(self, topic=None, difficulty=None, vetted=None, shuffle=False):
+        """Yield matching questions page by page; with shuffle, starting at a random id and wrapping around."""
+        where, params = self._where(topic, difficulty, vetted)
+        with self._lock:
+            low, high = self._db.execute(f"SELECT MIN(id), MAX(id) FROM questions{where}", params).fetchone()
+        if low is None:
+            return
+        start = random.randint(low, high) if shuffle else low
+        for lower, upper in ((start, high), (low, start - 1)):
+            after = lower - 1
+            while after < upper:
+                bound = " AND " if where else " WHERE "
+                with self._lock:
+                    rows = self._db.execute(
+                        f"SELECT * FROM questions{where}{bound}id > ? AND id <= ? ORDER BY id LIMIT ?",
+                        params + [after, upper, PAGE_SIZE],
+                    ).fetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    yield _to_question(row)
+                after = rows[-1]["id"]
+
+    def sample(self, topic=None, difficulty=None, n=3, vetted=None):
+        questions = []
+        for question in self.iter_questions(topic, difficulty, vetted, shuffle=True):
+            questions.append(question)
+            if len(questions) >= n:
+                break
+        return questions
+
+    def next_unseen(self, topic, difficulty, is_seen, vetted=True):
+        """A random matching question for which is_seen(question_text) is False, or None when exhausted."""
+        for i, question in enumerate(self.iter_questions(topic, difficulty, vetted, shuffle=True)):
+            if i >= MAX_CANDIDATES:
+                break
+            if not is_seen(question["question"]):
+                return question
+        return None
+
+
+def _to_question(row):
+    return {
+        "id": row["id"],
+        "question": row["question"],
+        "topic": row["topic"],
+        "difficulty": row["difficulty"],
+        "vetted": bool(row["vetted"]),
+        **json.loads(row["payload"]),
+    }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_question_store():
+    # One store per server process; seeded from the in-code bank the first time
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = QuestionStore()
+            if _store.count() == 0:
+                from question_bank import QUESTION_BANK
+
+                _store.add_many(QUESTION_BANK, vetted=False, source="question_bank")
+        return _store
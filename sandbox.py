@@ -0,0 +1,303 @@
+import contextlib
+import io
+import multiprocessing as mp
+import os
+import queue
+import resource
+import signal
+import subprocess
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# Limits applied to every run of user code
+DEFAULT_TIMEOUT = float(os.environ.get("SANDBOX_TIMEOUT", 5))
+DEFAULT_CPU_SECONDS = int(os.environ.get("SANDBOX_CPU_SECONDS", 5))
+DEFAULT_MEMORY_MB = int(os.environ.get("SANDBOX_MEMORY_MB", 512))
+DEFAULT_POOL_SIZE = int(os.environ.get("SANDBOX_POOL_SIZE", 2))
+MAX_STDOUT_CHARS = 10_000
+# Extra time the pool gives a worker beyond the job's own timeout, which the worker enforces itself
+WORKER_GRACE_SECONDS = 2
+# The only environment variables workers start with; everything else (API keys, secrets) is left out
+ENV_ALLOWLIST = ("PATH", "PYTHONPATH", "HOME", "TMPDIR", "LANG", "LC_ALL", "LC_CTYPE", "TZ")
+
+
+def _current_address_space():
+    # Bytes of virtual memory already mapped (pandas/numpy reserve a lot up front)
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * resource.getpagesize()
+
+
+def _limit_memory(memory_mb):
+    try:
+        limit = _current_address_space() + memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (OSError, ValueError):
+        pass  # Not supported on this platform; the wall-clock timeout still applies
+
+
+def _limit_cpu(cpu_seconds):
+    # Set in each job's freshly forked child, whose CPU time starts from zero
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = cpu_seconds if hard == resource.RLIM_INFINITY else min(cpu_seconds, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _failure(outcome, error):
+    return {"ok": False, "stdout": "", "error": error, "traceback": None, "results": [], "outcome": outcome}
+
+
+def _run_job(job, preloaded_globals):
+    import test_runner
+
+    stdout = io.StringIO()
+    result = {"ok": True, "stdout": "", "error": None, "traceback": None, "results": []}
+    try:
+        with contextlib.redirect_stdout(stdout):
+            if job["kind"] == "tests":
+                result["results"] = test_runner.run_tests(
+                    job["code"], job["test_cases"], job["expected_values"], preloaded_globals,
+                    fail_fast=job.get("fail_fast", False),
+                )
+            elif job["kind"] == "profile":
+                import complexity_profiler
+
+                result["profile"] = complexity_profiler.profile_function(
+                    job["code"], job["test_cases"], preloaded_globals, budget=job["budget"],
+                )
+            else:
+                namespace = preloaded_globals.copy()
+                exec(job["code"], namespace, namespace)
+    except MemoryError:
+        result.update(ok=False, error="Memory limit exceeded.")
+    except BaseException as e:  # SystemExit/KeyboardInterrupt from user code must not kill the worker
+        result.update(ok=False, error=str(e) or type(e).__name__, traceback=traceback.format_exc())
+    result["stdout"] = stdout.getvalue()[:MAX_STDOUT_CHARS]
+    return result
+
+
+def _run_isolated(job, preloaded_globals, cpu_seconds, conn):
+    # Every job runs in a fresh fork of the warm worker, so whatever user code changes (modules such
+    # as test_runner, builtins, globals) is thrown away with the child instead of reaching the next job
+    reader, writer = mp.Pipe(duplex=False)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.setpgid(0, 0)  # Its own process group, so processes the user code starts are killed too
+            conn.close()
+            reader.close()
+            _limit_cpu(cpu_seconds)
+            writer.send(_run_job(job, preloaded_globals))
+        finally:
+            os._exit(0)
+    writer.close()
+    try:
+        os.setpgid(pid, pid)  # Also from this side, in case the child has not got that far yet
+    except (ProcessLookupError, PermissionError):
+        pass
+    try:
+        if reader.poll(job["timeout"]):
+            return reader.recv()
+        return _failure("timeout", f"Execution timed out after {job['timeout']:g} seconds.")
+    except EOFError:
+        # The child died: CPU limit (SIGXCPU), memory exhaustion or a crash in native code
+        return _failure("killed", "Execution was stopped: CPU or memory limit exceeded.")
+    finally:
+        reader.close()
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        os.waitpid(pid, 0)
+
+
+def _worker_main(conn, memory_mb, cpu_seconds):
+    # Imported once per worker, so every job's fork starts with them loaded
+    import complexity_profiler  # noqa: F401
+    import test_runner  # noqa: F401
+    from preloaded_packages import resolved_globals
+    preloaded_globals = resolved_globals()
+
+    _limit_memory(memory_mb)
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        conn.send(_run_isolated(job, preloaded_globals, cpu_seconds, conn))
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.ready = False
+
+    def wait_ready(self):
+        # The first job waits for the worker's imports (pandas, numpy) instead of timing out on them
+        if not self.ready:
+            self.conn.recv()
+            self.ready = True
+
+    def kill(self):
+        self.conn.close()
+        self.process.kill()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class SandboxPool:
+    """Pre-started worker processes that run untrusted user code with a timeout and rlimits."""
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 memory_mb=DEFAULT_MEMORY_MB, cpu_seconds=DEFAULT_CPU_SECONDS):
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.size = size
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        # A new interpreter rather than a fork: the app process (and anything forked from it) holds
+        # Streamlit's environment, secrets included, which /proc/<parent>/environ would reveal
+        parent_conn, child_conn = mp.Pipe()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "sandbox", str(child_conn.fileno()), str(self.memory_mb), str(self.cpu_seconds)],
+            pass_fds=(child_conn.fileno(),),
+            env={name: os.environ[name] for name in ENV_ALLOWLIST if name in os.environ},
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdin=subprocess.DEVNULL,
+        )
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def wait_ready(self):
+        """Block until every worker has finished starting up (they start in the background)."""
+        workers = [self._idle.get() for _ in range(self.size)]
+        try:
+            for worker in workers:
+                worker.wait_ready()
+        finally:
+            for worker in workers:
+                self._idle.put(worker)
+
+    def submit(self, job, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        with metrics.timed("tutor_code_execution_seconds", kind=job["kind"], outcome="ok") as labels:
+            result = self._submit(job, timeout)
+            if not result["ok"]:
+                labels["outcome"] = result.get("outcome", "error")
+        return result
+
+    def _submit(self, job, timeout):
+        worker = self._idle.get()  # Blocks when every worker is busy, which bounds concurrency
+        try:
+            worker.wait_ready()
+            # The worker times the job out itself; this only catches a worker that stopped responding
+            worker.conn.send({**job, "timeout": timeout})
+            if worker.conn.poll(timeout + WORKER_GRACE_SECONDS):
+                return worker.conn.recv()
+            worker.kill()
+            worker = self._spawn()
+            return _failure("timeout", f"Execution timed out after {timeout:g} seconds.")
+        except (EOFError, OSError):
+            # The worker itself died, e.g. killed by the OOM killer
+            worker.kill()
+            worker = self._spawn()
+            return _failure("killed", "Execution was stopped: CPU or memory limit exceeded.")
+        finally:
+            self._idle.put(worker)
+
+    def run_code(self, code, timeout=None):
+        return self.submit({"kind": "exec", "code": code}, timeout=timeout)
+
+    def run_tests(self, code, test_cases, expected_values=None, parallel=False, fail_fast=False, timeout=None):
+        """Run test cases against the code; returns one record per test case, in order.
+
+        With parallel=True each case is dispatched to the next idle worker. With fail_fast=True
+        cases after the first failure are reported as skipped (cases already running still finish).
+        """
+        from test_runner import canonicalize_expected, skipped_record
+
+        test_cases = [{k: tc[k] for k in ("input", "expected_output", "compare") if k in tc} for tc in test_cases]
+        if expected_values is None:
+            expected_values = canonicalize_expected(test_cases)
+
+        if not parallel or len(test_cases) < 2 or self.size < 2:
+            return self.submit({"kind": "tests", "code": code, "test_cases": test_cases,
+                                "expected_values": expected_values, "fail_fast": fail_fast}, timeout=timeout)
+
+        bounds = [(i, i + 1) for i in range(len(test_cases))]
+        failed = threading.Event()
+
+        def run_chunk(start, end):
+            if fail_fast and failed.is_set():
+                return {"ok": True, "stdout": "", "error": None, "traceback": None,
+                        "results": [skipped_record(tc) for tc in test_cases[start:end]]}
+            result = self.submit({"kind": "tests", "code": code, "test_cases": test_cases[start:end],
+                                  "expected_values": expected_values[start:end], "fail_fast": fail_fast},
+                                 timeout=timeout)
+            if not result["ok"] or any(not r["passed"] and not r["skipped"] for r in result["results"]):
+                failed.set()
+            return result
+
+        with ThreadPoolExecutor(max_workers=min(self.size, len(test_cases))) as executor:
+            chunk_results = list(executor.map(lambda b: run_chunk(*b), bounds))
+
+        # Merge chunks back into one result, in test case order
+        merged = {"ok": True, "stdout": "", "error": None, "traceback": None, "results": []}
+        for result in chunk_results:
+            merged["stdout"] += result["stdout"]
+            merged["results"].extend(result["results"])
+            if not result["ok"] and merged["ok"]:
+                merged.update(ok=False, error=result["error"], traceback=result["traceback"])
+        return merged
+
+    def profile(self, code, test_cases, budget=None):
+        """Estimate the code's time complexity on scaled-up test inputs (see complexity_profiler)."""
+        from complexity_profiler import TIME_BUDGET
+
+        budget = TIME_BUDGET if budget is None else budget
+        test_cases = [{"input": tc["input"]} for tc in test_cases]
+        # Measuring stops on its own within the budget; the timeout only covers generating the last input
+        return self.submit({"kind": "profile", "code": code, "test_cases": test_cases, "budget": budget},
+                           timeout=self.timeout + budget)
+
+    def shutdown(self):
+        while not self._idle.empty():
+            worker = self._idle.get_nowait()
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # One pool per server process, shared by all sessions
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+        return _pool
+
+
+if __name__ == "__main__":
+    # Worker entry point (see SandboxPool._spawn): the connection's fd and the limits
+    from multiprocessing.connection import Connection
+
+    _worker_main(Connection(int(sys.argv[1])), int(sys.argv[2]), int(sys.argv[3]))
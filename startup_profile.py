@@ -0,0 +1,74 @@
+"""Measure how long a cold app process takes to render the login page.
+
+Every run starts a fresh interpreter, renders main.py with Streamlit's AppTest (offline fake LLM
+backend, nobody logged in) and reports the import and render time, plus which heavy modules were
+loaded on the way. Those should all stay deferred until after login.
+
+    python startup_profile.py --runs 5
+    python startup_profile.py --runs 5 --budget 1.0   # exit 1 if the median render is slower
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that are slow to import and must not be needed for the login page
+HEAVY_MODULES = ["pandas", "numpy", "langchain_core", "langchain_openai", "langgraph", "firebase_admin",
+                 "google.cloud.firestore"]
+
+_CHILD = """
+import json, os, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(os.path.join(sys.argv[1], "main.py"), default_timeout=120)
+imported = time.perf_counter()
+app.run()
+rendered = time.perf_counter()
+print(json.dumps({
+    "streamlit_import_s": imported - started,
+    "login_render_s": rendered - imported,
+    "errors": [e.value for e in app.exception],
+    "heavy_modules": [m for m in json.loads(sys.argv[2]) if m in sys.modules],
+}))
+"""
+
+
+def measure_once():
+    env = dict(os.environ, TUTOR_LLM_BACKEND="fake")
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD, here, json.dumps(HEAVY_MODULES)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold starts to measure")
+    parser.add_argument("--budget", type=float, help="fail if the median login render exceeds this (seconds)")
+    args = parser.parse_args(argv)
+
+    runs = [measure_once() for _ in range(args.runs)]
+    renders = [r["login_render_s"] for r in runs]
+    median = statistics.median(renders)
+    print(f"streamlit import: {statistics.median(r['streamlit_import_s'] for r in runs):.3f} s (median)")
+    print(f"login page render: {median:.3f} s median, {min(renders):.3f}-{max(renders):.3f} s over {len(runs)} runs")
+
+    heavy = sorted({m for r in runs for m in r["heavy_modules"]})
+    errors = [e for r in runs for e in r["errors"]]
+    if heavy:
+        print(f"⚠️ heavy modules loaded before login: {', '.join(heavy)}")
+    if errors:
+        print(f"❌ errors while rendering: {errors[0]}")
+        return 1
+    if args.budget is not None and median > args.budget:
+        print(f"❌ over the {args.budget:g} s budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import ast
+from collections import OrderedDict
+
+from output_compare import is_output_equal
+
+# Per-process cache; sandbox jobs each run in a fresh fork, so there it lasts for one job
+MAX_CACHED_CODE = 256
+
+_code_cache = OrderedDict()
+
+
+def _remember(cache, key, value, limit):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > limit:
+        cache.popitem(last=False)
+
+
+def canonicalize_expected(test_cases):
+    """Turn expected output strings into Python values once per question.
+
+    Literals become {"value": ...}; anything else (e.g. "pd.Series([1, 2])") stays {"expr": ...}
+    and is compiled once and evaluated in the sandbox.
+    """
+    canonical = []
+    for test_case in test_cases:
+        expected = test_case["expected_output"]
+        if not isinstance(expected, str):
+            canonical.append({"value": expected})
+            continue
+        try:
+            canonical.append({"value": ast.literal_eval(expected.strip())})
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            canonical.append({"expr": expected})
+    return canonical
+
+
+def compile_cached(source, mode):
+    key = (mode, source)
+    code = _code_cache.get(key)
+    if code is None:
+        code = compile(source, "<solution>" if mode == "exec" else "<test>", mode)
+        _remember(_code_cache, key, code, MAX_CACHED_CODE)
+    else:
+        _code_cache.move_to_end(key)
+    return code
+
+
+def load_module(source, preloaded_globals):
+    """Execute the user's code in a fresh namespace; only the compiled code is reused between runs.
+
+    Module-level state (e.g. a global list the solution appends to) must not carry over from an
+    earlier run, or from another user's run in the same worker.
+    """
+    namespace = preloaded_globals.copy()
+    exec(compile_cached(source, "exec"), namespace, namespace)
+    return namespace
+
+
+def _describe(value):
+    try:
+        return repr(value)
+    except Exception as e:
+        return f"<unrepresentable {type(value).__name__}: {e}>"
+
+
+def run_case(namespace, test_case, expected_entry):
+    record = {"input": test_case["input"], "expected": test_case["expected_output"], "actual": None,
+              "passed": False, "error": None, "expected_error": None, "skipped": False}
+    try:
+        if "expr" in expected_entry:
+            expected = eval(compile_cached(expected_entry["expr"], "eval"), namespace)
+        else:
+            expected = expected_entry["value"]
+        record["expected"] = _describe(expected)
+    except Exception as e:
+        record["expected_error"] = str(e)
+        return record
+
+    try:
+        actual = eval(compile_cached(test_case["input"], "eval"), namespace)
+        record["actual"] = _describe(actual)
+        record["passed"] = bool(is_output_equal(actual, expected, test_case.get("compare")))
+    except Exception as e:
+        record["error"] = str(e)
+        record["actual"] = f"Error: {e}"
+    return record
+
+
+def skipped_record(test_case):
+    return {"input": test_case["input"], "expected": test_case["expected_output"], "actual": None,
+            "passed": False, "error": None, "expected_error": None, "skipped": True}
+
+
+def run_tests(source, test_cases, expected_values, preloaded_globals, fail_fast=False):
+    namespace = load_module(source, preloaded_globals)
+    results = []
+    for i, (test_case, expected_entry) in enumerate(zip(test_cases, expected_values)):
+        record = run_case(namespace, test_case, expected_entry)
+        results.append(record)
+        if fail_fast and not record["passed"] and not record["expected_error"]:
+            results.extend(skipped_record(tc) for tc in test_cases[i + 1:])
+            break
+    return results
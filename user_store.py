@@ -0,0 +1,49 @@
+import copy
+import streamlit as st
+from auth import update_user_fields
+
+
+class UserStore:
+    """Tracks changes to the session's user document and writes only what changed."""
+
+    def __init__(self, user):
+        self.user = user
+        self._snapshot = copy.deepcopy(user)
+
+    def changed_fields(self):
+        from firebase_admin import firestore  # Deferred: only needed once there is something to write
+
+        fields = {}
+        for key in set(self._snapshot) | set(self.user):
+            if key not in self.user:
+                fields[key] = firestore.DELETE_FIELD
+                continue
+
+            old, new = self._snapshot.get(key), self.user[key]
+            if key in self._snapshot and old == new:
+                continue
+
+            # Appending to a list (e.g. answered_questions) only sends the new items
+            if isinstance(old, list) and isinstance(new, list) and len(new) > len(old) and new[:len(old)] == old:
+                fields[key] = firestore.ArrayUnion(new[len(old):])
+            else:
+                fields[key] = new
+        return fields
+
+    def flush(self):
+        """Write all pending changes as one update; returns False when there was nothing to write."""
+        fields = self.changed_fields()
+        if not fields:
+            return False
+        update_user_fields(self.user["username"], fields)
+        self._snapshot = copy.deepcopy(self.user)
+        return True
+
+
+def get_user_store():
+    # A new store (and snapshot) is only taken when a different user object is logged in
+    store = st.session_state.get("user_store")
+    if store is None or store.user is not st.session_state.user:
+        store = UserStore(st.session_state.user)
+        st.session_state.user_store = store
+    return store